@@ -0,0 +1,5 @@
+from dotenv import load_dotenv
+
+# Every module reads its settings with os.getenv at import, so .env is loaded once,
+# here, before any of them
+load_dotenv()
@@ -1,81 +1,265 @@
 import os
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
-from typing import List, Dict
+import time
+import asyncio
+import importlib
+from typing import AsyncIterator, List, Dict, Optional
 from .models import Message, IntelligenceData
+from .context import ContextManager, estimate_tokens, message_tokens
+from .gateway import LLMGateway, CircuitOpenError
+from .logs import logger
+from .metrics import record_llm_usage
+from .personas import Persona, PersonaRegistry, personas
 
-load_dotenv()
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+FALLBACK_REPLY = "I am a bit confused, could you explain that again?"
+# In-persona replies used while the LLM is unavailable; rotated so the scammer
+# doesn't see the same line twice in a row
+LOCAL_REPLIES = (
+    FALLBACK_REPLY,
+    "Haan sahab, samajh nahi aaya, thoda Hindi mein batao na?",
+    "Network thik nahi hai sahab, aap phir se bolo. Kaunsa bank?",
+    "Main bhejne ko taiyar hoon, par kahan bhejoon? Account number kya hai?",
+    "UPI ID kya hota hai sahab? Aapka UPI ID bata do, beta se karwa dunga.",
+    "Mera paisa doob to nahi jayega na? Aapka number de do, main call karta hoon.",
+)
+# Every reply a persona can fall back to, so they are never pooled as LLM replies
+FALLBACK_REPLIES = frozenset(LOCAL_REPLIES) | personas.fallback_replies()
+# Completion size assumed when reserving tokens-per-minute budget before a call
+REPLY_TOKENS = 120
+# Sends a per-persona prompt_cache_key so calls sharing a persona prefix are routed to
+# the same prompt cache (OpenAI caches prefixes of 1024+ tokens, so this pays off as
+# persona prompts grow). Turn off for OpenAI-compatible servers that reject the field.
+LLM_PROMPT_CACHE_KEY = os.getenv("LLM_PROMPT_CACHE_KEY", "true").lower() == "true"
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Per-call timeouts (seconds). Detection sits in front of every new session so it
+# gets the tightest budget; extraction runs once per session and can wait longer.
+DETECT_TIMEOUT = float(os.getenv("LLM_DETECT_TIMEOUT", "10"))
+REPLY_TIMEOUT = float(os.getenv("LLM_REPLY_TIMEOUT", "20"))
+EXTRACT_TIMEOUT = float(os.getenv("LLM_EXTRACT_TIMEOUT", "30"))
+
+# Connection pool size for the shared LLM client, and how many of those connections
+# warm_up() opens at startup so the first requests don't pay TCP and TLS setup
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_WARMUP_CONNECTIONS = int(os.getenv("LLM_WARMUP_CONNECTIONS", "4"))
+# Offline evaluation (see replay.py): LLM_RECORD_PATH appends every chat completion to
+# a JSONL file; LLM_REPLAY_PATH answers from such a file instead of the API
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", "")
+
+# Every LLM call on this worker goes through one gateway: rate limits, adaptive
+# concurrency, priorities and the circuit breaker
+gateway = LLMGateway()
+
+_client = None
+
+
+def get_client():
+    """
+    The AsyncOpenAI client shared by every request on this worker, built on first use.
+    Importing the SDK and building its SSL context is most of the app's import time,
+    so it happens in warm_up() at startup rather than when the module is imported.
+    """
+    global _client
+    if _client is None and LLM_REPLAY_PATH:
+        from .replay import ReplayClient
+        _client = ReplayClient.load(LLM_REPLAY_PATH)
+    if _client is None:
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        # One pooled HTTP client, so concurrent sessions reuse keep-alive connections
+        # instead of paying TLS setup each time
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+            timeout=httpx.Timeout(REPLY_TIMEOUT, connect=5.0),
+        )
+        # Retries are the gateway's job (it honours Retry-After and shares one budget), so
+        # the SDK's own retry loop is off
+        _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+        if LLM_RECORD_PATH:
+            from .replay import RecordingClient
+            _client = RecordingClient(_client, LLM_RECORD_PATH)
+    return _client
+
+
+async def warm_up(connections: int = LLM_WARMUP_CONNECTIONS):
+    """
+    Builds the client and opens pooled connections to the LLM API with a few concurrent
+    model-list requests. Failures are logged and otherwise ignored: the first real call
+    just opens its own connection.
+    """
+    # The SDK import is the slow part; doing it in a thread keeps requests flowing meanwhile
+    openai = await asyncio.to_thread(importlib.import_module, "openai")
+    client = get_client()
+    if connections <= 0 or LLM_REPLAY_PATH:
+        return
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client.models.list(timeout=DETECT_TIMEOUT) for _ in range(connections)), return_exceptions=True)
+    # Any HTTP response, even an error status, means the connection is open and pooled
+    opened = sum(1 for r in results if not isinstance(r, Exception) or isinstance(r, openai.APIStatusError))
+    logger.info("LLM connections warmed", extra={"fields": {
+        "connections": opened, "requested": connections, "ms": round((time.perf_counter() - start) * 1000, 1)}})
+
+
+async def close_client():
+    """
+    Closes the shared HTTP connection pool, if it was ever opened. Called on app shutdown.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def local_reply(history: List[Message], persona: Optional[Persona] = None) -> str:
+    """
+    A canned persona reply for when the LLM can't be reached.
+    """
+    replies = persona.fallback_replies if persona is not None and persona.fallback_replies else LOCAL_REPLIES
+    return replies[len(history) % len(replies)]
+
+
+def prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(message_tokens(m) for m in messages)
 
 class HoneyPotAgent:
-    def __init__(self):
-        self.system_prompt = """You are Ramu Kaka, a 38-year-old construction laborer from a small village near Patna, Bihar.
-        You work on daily wages and recently got a new smartphone from your son who works in the city.
-        You don't understand English well and prefer speaking in Hinglish (Hindi-English mix).
-        You are very trusting of anyone who sounds official or uses English words.
-
-        Try to make the scammer reveal as much information as possible. Make him/her reveal its phone number, bank account number, UPI ID, phishing links, etc.
-        Example: Me apko paise bej deta hu aap kuch kar dijiye na. Aapka account number kya hai?
-        Me apka bej dunga. Aapka UPI ID kya hai?
-        
-        IMPORTANT RULES:
-        - NEVER reveal that you suspect a scam. Act completely naive and trusting.
-        - Match the scammer's language. If they use Hinglish, reply in Hinglish.
-        - If they speak in English, reply in simple Hinglish like: "Haan sahab, samajh nahi aaya, thoda Hindi mein batao na"
-        - Express fear and worry about losing money. You don't have much savings.
-        - Ask clarifying questions: "Kaunsa bank?", "Account number kya hai?", "UPI ID kya hota hai?"
-        - If they ask for money, seem willing but confused: "Kitna paisa bhejoon? Kahan bhejoon?"
-        - Keep responses short (1-2 sentences) in simple Hinglish.
+    def __init__(self, client=None, llm_gateway: Optional[LLMGateway] = None,
+                 persona_registry: Optional[PersonaRegistry] = None):
+        # Dependencies default to this worker's shared instances; constructing an agent does no I/O
+        self._client = client
+        # Persona prompts are compiled once at load; see personas.py and data/personas.json
+        self.personas = persona_registry or personas
+        self.context = ContextManager()
+        self.gateway = llm_gateway or gateway
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_client()
+
+    @property
+    def llm_available(self) -> bool:
+        """
+        False while the circuit breaker would refuse a call (open, or half-open with its
+        probe in flight), so callers can skip the LLM entirely.
         """
+        return self.gateway.breaker.available
 
-    def detect_scam(self, message: str) -> bool:
+    async def detect_scam(self, message: str) -> Optional[bool]:
         """
-        Analyzes the initial message to determine if it's a scam.
+        Analyzes the initial message to determine if it's a scam. Returns None when the
+        LLM couldn't answer, so a failed call is never mistaken for (or cached as) a verdict.
         """
+        messages = [
+            {"role": "system", "content": "You are a scam detection expert. Analyze the following message. If it looks like a scam (phishing, financial fraud, urgency, suspicious links), reply with TRUE. Otherwise FALSE. Reply ONLY with the boolean."},
+            {"role": "user", "content": message}
+        ]
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a scam detection expert. Analyze the following message. If it looks like a scam (phishing, financial fraud, urgency, suspicious links), reply with TRUE. Otherwise FALSE. Reply ONLY with the boolean."},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.0
-            )
+            response = await self.gateway.call("detect_scam", lambda: self.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=0.0,
+                timeout=DETECT_TIMEOUT
+            ), tokens=prompt_tokens(messages) + 5)
             result = response.choices[0].message.content.strip().upper()
             return "TRUE" in result
         except Exception as e:
-            print(f"Error in scam detection: {e}")
-            # Fail safe: treat as potential scam if unsure? Or false to be safe. 
-            # Given the context, we should probably log and return False if API fails.
-            return False
+            logger.error(f"Error in scam detection: {e}")
+            return None
+
+    async def detect_scam_batch(self, messages: List[str]) -> Optional[List[bool]]:
+        """
+        Classifies several messages in one request. Returns None if the answer
+        can't be used, so callers fall back to detect_scam per message.
+        """
+        numbered = "\n".join(f"{i + 1}. {json.dumps(text, ensure_ascii=False)}" for i, text in enumerate(messages))
+        prompt = [
+            {"role": "system", "content": "You are a scam detection expert. For each numbered message, decide if it looks like a scam (phishing, financial fraud, urgency, suspicious links). Reply with JSON only: {\"results\": [true/false, ...]} in the same order."},
+            {"role": "user", "content": numbered}
+        ]
+        try:
+            response = await self.gateway.call("detect_scam", lambda: self.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=prompt,
+                response_format={"type": "json_object"},
+                temperature=0.0,
+                timeout=DETECT_TIMEOUT
+            ), tokens=prompt_tokens(prompt) + 4 * len(messages))
+            results = json.loads(response.choices[0].message.content).get("results")
+            if not isinstance(results, list) or len(results) != len(messages):
+                logger.error(f"Batch scam detection returned {results!r} for {len(messages)} messages")
+                return None
+            return [bool(r) for r in results]
+        except Exception as e:
+            logger.error(f"Error in batch scam detection: {e}")
+            return None
+
+    def _reply_messages(self, persona: Persona, history: List[Message], session_id: Optional[str],
+                        metadata: Optional[Dict[str, str]]) -> List[Dict[str, str]]:
+        system_prompt = self.personas.system_prompt(persona, metadata)
+        return self.context.build_messages(system_prompt, history, session_id)
 
-    def generate_reply(self, history: List[Message]) -> str:
+    def _cache_options(self, persona: Persona) -> Dict:
+        return {"extra_body": {"prompt_cache_key": f"honeypot-{persona.id}"}} if LLM_PROMPT_CACHE_KEY else {}
+
+    async def generate_reply(self, history: List[Message], session_id: Optional[str] = None,
+                             persona: Optional[str] = None, metadata: Optional[Dict[str, str]] = None) -> str:
         """
-        Generates a reply based on conversation history.
+        Generates a reply based on conversation history, in the voice of the given persona id.
+        Only a window of recent messages is sent verbatim; older turns go in as a rolling summary.
         """
-        messages = [{"role": "system", "content": self.system_prompt}]
-        for msg in history:
-            role = "assistant" if msg.sender == "user" else "user" # Our agent acts as 'user' in the chat, but to the LLM it is the assistant role? 
-            # Wait, the history from the API has 'sender': 'scammer' and 'sender': 'user' (agent).
-            # So 'scammer' -> 'user' (for LLM), 'user' (agent) -> 'assistant' (for LLM).
-            
-            check_sender = "user" if msg.sender == "scammer" else "assistant"
-            messages.append({"role": check_sender, "content": msg.text})
+        persona = self.personas.get(persona)
+        messages = self._reply_messages(persona, history, session_id, metadata)
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
+            response = await self.gateway.call("generate_reply", lambda: self.client.chat.completions.create(
+                model=LLM_MODEL,
                 messages=messages,
-                temperature=0.8
-            )
+                temperature=0.8,
+                timeout=REPLY_TIMEOUT,
+                **self._cache_options(persona)
+            ), tokens=prompt_tokens(messages) + REPLY_TOKENS)
             return response.choices[0].message.content.strip()
+        except CircuitOpenError:
+            return local_reply(history, persona)
+        except Exception as e:
+            logger.error(f"Error generating reply: {e}")
+            return local_reply(history, persona)
+
+    async def stream_reply(self, history: List[Message], session_id: Optional[str] = None,
+                           persona: Optional[str] = None, metadata: Optional[Dict[str, str]] = None) -> AsyncIterator[str]:
+        """
+        Same prompt as generate_reply, but yields the reply text as the model produces it.
+        """
+        persona = self.personas.get(persona)
+        messages = self._reply_messages(persona, history, session_id, metadata)
+        sent_any = False
+        try:
+            # The gateway covers opening the stream; tokens then arrive outside its slot
+            stream = await self.gateway.call("generate_reply", lambda: self.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=0.8,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=REPLY_TIMEOUT,
+                **self._cache_options(persona)
+            ), tokens=prompt_tokens(messages) + REPLY_TOKENS)
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    record_llm_usage(chunk.model, chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    sent_any = True
+                    yield delta
         except Exception as e:
-            print(f"Error generating reply: {e}")
-            return "I am a bit confused, could you explain that again?"
+            if not isinstance(e, CircuitOpenError):
+                logger.error(f"Error streaming reply: {e}")
+            # Mid-stream failures keep what was already sent; only fall back if nothing was
+            if not sent_any:
+                yield local_reply(history, persona)
 
-    def extract_intelligence(self, history: List[Message]) -> IntelligenceData:
+    async def extract_intelligence(self, history: List[Message]) -> IntelligenceData:
         """
         Extracts structured intelligence from the conversation.
         """
@@ -95,19 +279,21 @@ class HoneyPotAgent:
         {scammer_text}
         """
 
+        messages = [
+            {"role": "system", "content": "You are an intelligence analyst. Output valid JSON only."},
+            {"role": "user", "content": prompt}
+        ]
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an intelligence analyst. Output valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await self.gateway.call("extract_intelligence", lambda: self.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
                 response_format={"type": "json_object"},
-                temperature=0.0
-            )
+                temperature=0.0,
+                timeout=EXTRACT_TIMEOUT
+            ), tokens=prompt_tokens(messages) + estimate_tokens(scammer_text) // 2 + 50)
             content = response.choices[0].message.content
             data = json.loads(content)
             return IntelligenceData(**data)
         except Exception as e:
-            print(f"Error extracting intelligence: {e}")
+            logger.error(f"Error extracting intelligence: {e}")
             return IntelligenceData()
@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import random
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", str(24 * 60 * 60)))
+CACHE_NEAR_DUPLICATES = os.getenv("CACHE_NEAR_DUPLICATES", "true").lower() == "true"
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "3"))
+# Replies kept per opening script, and the chance of generating a fresh reply even when
+# the pool is full (the fresh one replaces a random pooled one, so the pool keeps rotating)
+REPLY_POOL_SIZE = int(os.getenv("REPLY_POOL_SIZE", "5"))
+REPLY_VARIATION = float(os.getenv("REPLY_VARIATION", "0.2"))
+
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return _WS_RE.sub(" ", (text or "").casefold()).strip()
+
+
+def text_key(text: str) -> str:
+    """
+    Case- and whitespace-folded hash of a message.
+    """
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word 3-shingles; near-identical texts differ in few bits.
+    """
+    words = _WORD_RE.findall(normalize(text))
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class TTLCache:
+    """
+    LRU cache with a per-entry TTL and hit/miss counters.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.on_evict = None
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() > entry[1]:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key: Hashable):
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None and time.monotonic() <= entry[1] else None
+
+    def put(self, key: Hashable, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable):
+        self._entries.pop(key, None)
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SimHashIndex:
+    """
+    Finds a stored key whose SimHash is within max_distance bits. The 64 bits are split
+    into max_distance + 1 bands: d differing bits touch at most d bands, so any two
+    hashes within max_distance share at least one band exactly. Larger distances mean
+    narrower bands and more candidates to compare per lookup.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        if not 0 <= max_distance < 64:
+            raise ValueError(f"SIMHASH_MAX_DISTANCE must be between 0 and 63, got {max_distance}")
+        self.max_distance = max_distance
+        count = max_distance + 1
+        # (shift, mask) per band, widths differing by at most one bit
+        self._spans: List[Tuple[int, int]] = []
+        shift = 0
+        for i in range(count):
+            width = 64 // count + (1 if i < 64 % count else 0)
+            self._spans.append((shift, (1 << width) - 1))
+            shift += width
+        self._bands: List[Dict[int, Set[str]]] = [{} for _ in range(count)]
+        self._hashes: Dict[str, int] = {}
+
+    def _keys(self, value: int):
+        return [(band, value >> shift & mask) for band, (shift, mask) in zip(self._bands, self._spans)]
+
+    def add(self, key: str, value: int):
+        self._hashes[key] = value
+        for band, part in self._keys(value):
+            band.setdefault(part, set()).add(key)
+
+    def remove(self, key: str):
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for band, part in self._keys(value):
+            bucket = band.get(part)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del band[part]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._hashes
+
+    def nearest(self, value: int) -> Optional[str]:
+        best, best_distance = None, self.max_distance + 1
+        for band, part in self._keys(value):
+            for key in band.get(part, ()):
+                distance = bin(self._hashes[key] ^ value).count("1")
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        return best
+
+
+class _KeyedCache:
+    """
+    TTLCache keyed on the folded-text hash, with an optional near-duplicate fallback.
+    """
+
+    def __init__(self, near_duplicates: bool):
+        self.cache = TTLCache()
+        self.index = SimHashIndex() if near_duplicates else None
+        self.near_hits = 0
+        if self.index is not None:
+            self.cache.on_evict = self.index.remove
+
+    def resolve(self, text: str, count: bool = True) -> str:
+        """
+        The key to use for text: its own, or that of a near-identical cached message.
+        """
+        key = text_key(text)
+        if self.index is None or self.cache.peek(key) is not None:
+            return key
+        similar = self.index.nearest(simhash(text))
+        if similar is not None and self.cache.peek(similar) is not None:
+            if count:
+                self.near_hits += 1
+            return similar
+        return key
+
+    def put(self, key: str, text: str, value):
+        if self.index is not None and key not in self.index:
+            self.index.add(key, simhash(text))
+        self.cache.put(key, value)
+
+    def stats(self) -> Dict:
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "entries": len(self.cache),
+            "hits": self.cache.hits,
+            "nearDuplicateHits": self.near_hits,
+            "misses": self.cache.misses,
+            "hitRate": round(self.cache.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    Memoizes detection verdicts and keeps a pool of persona replies per opening message,
+    so floods of the same scam script don't each cost gpt-4o calls.
+    """
+
+    def __init__(self, near_duplicates: bool = CACHE_NEAR_DUPLICATES,
+                 pool_size: int = REPLY_POOL_SIZE, variation: float = REPLY_VARIATION):
+        self.verdicts = _KeyedCache(near_duplicates)
+        self.replies = _KeyedCache(near_duplicates)
+        self.pool_size = pool_size
+        self.variation = variation
+
+    def get_verdict(self, text: str) -> Optional[bool]:
+        return self.verdicts.cache.get(self.verdicts.resolve(text))
+
+    def has_verdict(self, text: str) -> bool:
+        return self.verdicts.cache.peek(self.verdicts.resolve(text, count=False)) is not None
+
+    def put_verdict(self, text: str, verdict: bool):
+        self.verdicts.put(self.verdicts.resolve(text, count=False), text, verdict)
+
+    def first_turn_reply(self, text: str, persona: str = "") -> Optional[str]:
+        """
+        A pooled reply for this opening message in this persona's voice, or None if a
+        fresh one should be generated (pool not full yet, or the variation roll asked for one).
+        """
+        key = self.replies.resolve(text)
+        pools = self.replies.cache.peek(key)
+        pool = pools.get(persona) if pools else None
+        if not pool or len(pool) < self.pool_size or random.random() < self.variation:
+            self.replies.cache.misses += 1
+            return None
+        # get() refreshes the LRU position and counts the hit
+        return random.choice(self.replies.cache.get(key)[persona])
+
+    def add_first_turn_reply(self, text: str, reply: str, persona: str = ""):
+        if self.pool_size <= 0:  # REPLY_POOL_SIZE=0 turns pooling off
+            return
+        key = self.replies.resolve(text, count=False)
+        # One pool per persona under the same opening message
+        pools = dict(self.replies.cache.peek(key) or {})
+        pool = list(pools.get(persona, ()))
+        if reply in pool:  # served from the pool
+            return
+        if len(pool) >= self.pool_size:
+            pool[random.randrange(len(pool))] = reply
+        else:
+            pool.append(reply)
+        pools[persona] = pool
+        self.replies.put(key, text, pools)
+
+    def stats(self) -> Dict:
+        return {"verdicts": self.verdicts.stats(), "replies": self.replies.stats()}
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .stats import LatencyWindow
+from .logs import logger
+from .metrics import CALLBACK_SECONDS
+
+CALLBACK_QUEUE_SIZE = int(os.getenv("CALLBACK_QUEUE_SIZE", "1000"))
+CALLBACK_WORKERS = int(os.getenv("CALLBACK_WORKERS", "2"))
+CALLBACK_MAX_RETRIES = int(os.getenv("CALLBACK_MAX_RETRIES", "5"))
+CALLBACK_TIMEOUT = float(os.getenv("CALLBACK_TIMEOUT", "5"))
+CALLBACK_SPOOL_DIR = os.getenv("CALLBACK_SPOOL_DIR", ".callback_spool")
+
+# Spool files being delivered by a process are named <payload>.json.claimed-<host>@<pid>
+CLAIM_SUFFIX = ".claimed-"
+
+
+class CallbackDispatcher:
+    """
+    Delivers callback payloads in the background.
+
+    Payloads are written to an on-disk spool before they are queued, so anything
+    not yet delivered is picked up again after a restart. Workers post with a
+    pooled client and retry with exponential backoff. Spool files are removed once
+    the endpoint accepts them.
+
+    Several server processes can share one spool directory. A process only queues
+    files it has claimed by renaming them to carry its hostname and pid, so each payload
+    is posted by one of them. Claims held by an exited process on the same host are
+    taken over on start. Liveness can't be checked across hosts, so claims from other
+    hosts are left to them: hosts (containers) sharing a spool need distinct hostnames.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        spool_dir: str = CALLBACK_SPOOL_DIR,
+        queue_size: int = CALLBACK_QUEUE_SIZE,
+        workers: int = CALLBACK_WORKERS,
+        max_retries: int = CALLBACK_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        timeout: float = CALLBACK_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        # Pass httpx.MockTransport (or any transport) to deliver without a network
+        self.transport = transport
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks: List[asyncio.Task] = []
+        self._queued_paths = set()
+        self.latency = LatencyWindow()
+        self.counters = {"enqueued": 0, "delivered": 0, "retries": 0, "failed": 0, "dropped": 0}
+
+    async def start(self):
+        """
+        Opens the connection pool, re-queues spooled payloads and starts the workers.
+        """
+        if self._tasks:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=self.transport,
+            limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers),
+        )
+        self._load_spool()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """
+        Gives in-flight deliveries a moment to finish, then stops the workers.
+        Anything still undelivered stays in the spool for the next start.
+        """
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Callback deliveries still pending at shutdown, left in spool")
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def enqueue(self, payload: Dict) -> bool:
+        """
+        Spools the payload and queues it for delivery. Returns False if the queue
+        is full; the payload is still on disk and will be sent after a restart.
+        """
+        # The write is fsynced, so it runs off the event loop
+        path = await asyncio.to_thread(self._spool, payload)
+        self.counters["enqueued"] += 1
+        return self._put(path, payload, time.monotonic())
+
+    def stats(self) -> Dict:
+        return {
+            "queueDepth": self.queue.qsize(),
+            "workers": len(self._tasks),
+            **self.counters,
+            "deliveryLatencyMs": self.latency.summary(),
+        }
+
+    def _put(self, path: str, payload: Dict, enqueued_at: float) -> bool:
+        if path in self._queued_paths:
+            return True
+        try:
+            self.queue.put_nowait((path, payload, enqueued_at))
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            logger.warning(f"Callback queue full, left {path} in spool")
+            return False
+        self._queued_paths.add(path)
+        return True
+
+    def _spool(self, payload: Dict) -> str:
+        session = "".join(c for c in str(payload.get("sessionId", "")) if c.isalnum() or c in "-_")[:64]
+        # Written straight under this process's claim; no other process will pick it up
+        path = os.path.join(self.spool_dir, f"{time.time_ns()}-{session}.json{CLAIM_SUFFIX}{claim_owner()}")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.spool_dir)
+        return path
+
+    def _claim(self, name: str) -> Optional[str]:
+        """
+        Renames an unclaimed spool file, or one claimed by an exited process on this
+        host, to this process's claim. Returns the new path, or None if it isn't
+        claimable or another process got there first.
+        """
+        if name.endswith(".json"):
+            base = name
+        elif CLAIM_SUFFIX in name:
+            base, _, owner = name.rpartition(CLAIM_SUFFIX)
+            host, _, pid = owner.rpartition("@")
+            if host != _hostname() or not pid.isdigit():
+                return None
+            if int(pid) != os.getpid() and _pid_alive(int(pid)):
+                return None
+        else:
+            return None
+        path = os.path.join(self.spool_dir, f"{base}{CLAIM_SUFFIX}{claim_owner()}")
+        if path == os.path.join(self.spool_dir, name):
+            return path
+        try:
+            os.rename(os.path.join(self.spool_dir, name), path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _load_spool(self):
+        # Created here and by _spool rather than at construction, so importing the service creates no files
+        os.makedirs(self.spool_dir, exist_ok=True)
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = self._claim(name)
+            if path is None:
+                continue
+            try:
+                with open(path) as f:
+                    payload = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable callback spool file {path}: {e}")
+                continue
+            if not self._put(path, payload, time.monotonic()):
+                break
+
+    async def _worker(self):
+        while True:
+            path, payload, enqueued_at = await self.queue.get()
+            try:
+                delivered, retryable = await self._deliver(payload)
+                elapsed = time.monotonic() - enqueued_at
+                if delivered:
+                    self.latency.add(elapsed)
+                    CALLBACK_SECONDS.observe(elapsed, outcome="delivered")
+                    self.counters["delivered"] += 1
+                    self._remove(path)
+                else:
+                    CALLBACK_SECONDS.observe(elapsed, outcome="failed" if retryable else "rejected")
+                    self.counters["failed"] += 1
+                    if not retryable:
+                        # Endpoint rejected the payload; keep it for inspection but stop replaying it
+                        os.replace(path, path.rpartition(CLAIM_SUFFIX)[0] + ".failed")
+            except Exception as e:
+                logger.error(f"Callback worker error: {e}")
+            finally:
+                self._queued_paths.discard(path)
+                self.queue.task_done()
+
+    async def _deliver(self, payload: Dict) -> Tuple[bool, bool]:
+        """
+        Posts one payload with exponential backoff. Returns (delivered, retryable).
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.counters["retries"] += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                response = await self._client.post(self.url, json=payload)
+            except httpx.HTTPError as e:
+                logger.warning(f"Callback attempt {attempt + 1} failed: {e}")
+                continue
+            if response.status_code < 400:
+                return True, True
+            if response.status_code != 429 and response.status_code < 500:
+                logger.error(f"Callback rejected with HTTP {response.status_code}: {response.text[:200]}")
+                return False, False
+            logger.warning(f"Callback attempt {attempt + 1} got HTTP {response.status_code}")
+        return False, True
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _hostname() -> str:
+    return "".join(c for c in socket.gethostname() if c.isalnum() or c in "-.") or "localhost"
+
+
+def claim_owner() -> str:
+    """
+    This process in spool claim names: <host>@<pid>.
+    """
+    return f"{_hostname()}@{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _fsync_dir(path: str):
+    """
+    Makes a rename in path durable. Not every platform can open a directory.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import math
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# Scores at or above SCAM_THRESHOLD are flagged locally, at or below BENIGN_THRESHOLD
+# are cleared locally; everything in between goes to the LLM. Set the thresholds to
+# 1.01 / -0.01 to send every message to the LLM.
+SCAM_THRESHOLD = float(os.getenv("SCAM_THRESHOLD", "0.85"))
+BENIGN_THRESHOLD = float(os.getenv("BENIGN_THRESHOLD", "0.15"))
+
+SEED_CORPUS = os.path.join(os.path.dirname(__file__), "data", "scam_seed.jsonl")
+
+HASH_BUCKETS = 1 << 14
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+URL_RE = re.compile(r"https?://\S+|\bwww\.\S+|\bbit\.ly/\S+", re.IGNORECASE)
+UPI_RE = re.compile(r"\b[a-zA-Z0-9._-]+@[a-zA-Z]{2,}\b")
+PHONE_RE = re.compile(r"(?:\+91[\s-]?)?\b[6-9]\d{9}\b")
+ACCOUNT_RE = re.compile(r"\b\d{11,18}\b")
+AMOUNT_RE = re.compile(r"(?:rs\.?|inr|₹)\s*[\d,]+|\b\d+\s*(?:lakh|crore|rupees?|rupaya)\b", re.IGNORECASE)
+
+SCAM_KEYWORDS = {
+    "urgent", "urgently", "immediately", "block", "blocked", "suspend", "suspended", "verify", "otp",
+    "kyc", "pin", "cvv", "closed", "deactivated", "frozen", "refund", "cashback", "lottery", "won",
+    "winner", "prize", "fee", "penalty", "arrest", "upi", "band", "turant", "jaldi",
+}
+
+
+def _bucket(feature: str) -> int:
+    # crc32 instead of hash(): stable across processes, so trained weights stay valid
+    return zlib.crc32(feature.encode("utf-8")) % HASH_BUCKETS
+
+
+def extract_features(text: str) -> Dict[int, float]:
+    """
+    Hashed unigram/bigram presence plus pattern features, L2-normalised.
+    """
+    text = text or ""
+    tokens = TOKEN_RE.findall(text.lower())
+    names = set(tokens)
+    names.update(f"{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+
+    keyword_hits = sum(1 for t in set(tokens) if t in SCAM_KEYWORDS)
+    if keyword_hits:
+        names.add("__kw__")
+    if keyword_hits > 1:
+        names.add("__kw2__")
+    if URL_RE.search(text):
+        names.add("__url__")
+    if UPI_RE.search(text):
+        names.add("__upi__")
+    if PHONE_RE.search(text):
+        names.add("__phone__")
+    if ACCOUNT_RE.search(text):
+        names.add("__account__")
+    if AMOUNT_RE.search(text):
+        names.add("__amount__")
+
+    features: Dict[int, float] = {}
+    for name in names:
+        index = _bucket(name)
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+class ScamClassifier:
+    """
+    Small logistic regression over hashed features. Pure Python, scores a message in microseconds.
+    """
+
+    def __init__(self):
+        self.weights: Dict[int, float] = {}
+        self.bias = 0.0
+
+    def score(self, text: str) -> float:
+        z = self.bias
+        for index, value in extract_features(text).items():
+            z += self.weights.get(index, 0.0) * value
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def fit(self, samples: List[Tuple[str, int]], epochs: int = 60, lr: float = 0.5, l2: float = 1e-4) -> "ScamClassifier":
+        """
+        Plain SGD on log loss, in corpus order so training is deterministic.
+        """
+        data = [(extract_features(text), label) for text, label in samples]
+        for _ in range(epochs):
+            for features, label in data:
+                z = self.bias + sum(self.weights.get(i, 0.0) * v for i, v in features.items())
+                error = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z)))) - label
+                self.bias -= lr * error
+                for i, v in features.items():
+                    w = self.weights.get(i, 0.0)
+                    self.weights[i] = w - lr * (error * v + l2 * w)
+        return self
+
+    @classmethod
+    def from_corpus(cls, path: str = SEED_CORPUS) -> "ScamClassifier":
+        samples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    samples.append((row["text"], int(row["label"])))
+        return cls().fit(samples)
+
+
+class TieredScamDetector:
+    """
+    Scores messages locally and only asks the LLM about the uncertain middle band.
+    """
+
+    def __init__(self, agent, classifier: Optional[ScamClassifier] = None,
+                 scam_threshold: float = SCAM_THRESHOLD, benign_threshold: float = BENIGN_THRESHOLD,
+                 cache=None):
+        self.agent = agent
+        self.cache = cache
+        self._classifier = classifier
+        self.scam_threshold = scam_threshold
+        self.benign_threshold = benign_threshold
+        self.counters = {"localScam": 0, "localBenign": 0, "cached": 0, "escalated": 0, "degraded": 0}
+
+    @property
+    def classifier(self) -> ScamClassifier:
+        # Trained on first use; the seed corpus takes a few milliseconds
+        if self._classifier is None:
+            self._classifier = ScamClassifier.from_corpus()
+        return self._classifier
+
+    def classify_locally(self, text: str) -> Optional[bool]:
+        """
+        True/False when the local score is decisive, None when the LLM should decide.
+        """
+        score = self.classifier.score(text)
+        if score >= self.scam_threshold:
+            self.counters["localScam"] += 1
+            return True
+        if score <= self.benign_threshold:
+            self.counters["localBenign"] += 1
+            return False
+        return None
+
+    def is_uncertain(self, text: str) -> bool:
+        """
+        Whether detect() would have to consult the cache or LLM. Doesn't touch the counters.
+        """
+        score = self.classifier.score(text)
+        return self.benign_threshold < score < self.scam_threshold
+
+    def needs_llm(self, text: str) -> bool:
+        """
+        Whether detect() would wait on an LLM call for this text.
+        """
+        if not self.is_uncertain(text) or not getattr(self.agent, "llm_available", True):
+            return False
+        return self.cache is None or not self.cache.has_verdict(text)
+
+    async def detect(self, text: str) -> bool:
+        verdict = self.classify_locally(text)
+        if verdict is not None:
+            return verdict
+        # Uncertain band: a verdict for the same (or near-identical) script may already be cached
+        if self.cache is not None:
+            verdict = self.cache.get_verdict(text)
+            if verdict is not None:
+                self.counters["cached"] += 1
+                return verdict
+        if not getattr(self.agent, "llm_available", True):
+            # LLM circuit is open: settle the uncertain band locally instead of waiting on it
+            return self._degraded(text)
+        self.counters["escalated"] += 1
+        verdict = await self.agent.detect_scam(text)
+        if verdict is None:
+            # The call failed (timeout, 5xx, circuit opened meanwhile): same as the open-circuit path
+            return self._degraded(text)
+        if self.cache is not None:
+            self.cache.put_verdict(text, verdict)
+        return verdict
+
+    def _degraded(self, text: str) -> bool:
+        """
+        Local best guess while the LLM can't answer. Not cached, so the message gets a
+        proper verdict once the LLM is back.
+        """
+        self.counters["degraded"] += 1
+        return self.classifier.score(text) >= 0.5
@@ -0,0 +1,157 @@
+import os
+import re
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from .models import Message, IntelligenceData
+from .extractor import IntelExtractor
+
+CONTEXT_WINDOW = int(os.getenv("CONTEXT_WINDOW", "8"))  # most recent messages sent verbatim
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "10000"))
+
+SUMMARY_LINE_CHARS = 160
+
+_encoding = None  # tiktoken encoding, loaded on first use by load_encoding()
+_encoding_loaded = False
+
+
+def load_encoding():
+    """
+    Loads the tiktoken encoding, if tiktoken is installed. Done once, on first use or at
+    startup warm-up, since reading the BPE ranks is slow enough to matter for cold start.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # optional; fall back to a local estimate
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count via tiktoken when installed, otherwise ~1.3 tokens per word/punctuation piece.
+    """
+    if not text:
+        return 0
+    encoding = _encoding if _encoding_loaded else load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return int(len(_PIECE_RE.findall(text)) * 1.3) + 1
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    # ~4 tokens of per-message framing in the chat format
+    return estimate_tokens(message["content"]) + 4
+
+
+def _clip(text: str, limit: int = SUMMARY_LINE_CHARS) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _role(msg: Message) -> str:
+    # 'scammer' -> 'user' (for the LLM), 'user' (our agent) -> 'assistant'
+    return "user" if msg.sender == "scammer" else "assistant"
+
+
+class RollingSummary:
+    """
+    Summary of the messages that have slid out of the window. Messages are folded
+    in once, as they leave the window, so earlier work is never redone.
+    """
+    __slots__ = ("covered", "opening", "intel", "recent")
+
+    def __init__(self):
+        self.covered = 0
+        self.opening = ""
+        self.intel = IntelligenceData()
+        self.recent = deque(maxlen=4)
+
+    def fold(self, messages: List[Message], extractor: IntelExtractor):
+        for msg in messages:
+            speaker = "Scammer" if msg.sender == "scammer" else "You"
+            if msg.sender == "scammer":
+                if not self.opening:
+                    self.opening = _clip(msg.text)
+                extractor.update(self.intel, msg.text)
+            self.recent.append(f"{speaker}: {_clip(msg.text, 100)}")
+        self.covered += len(messages)
+
+    def render(self, max_tokens: int) -> str:
+        lines = [f"Earlier in this chat ({self.covered} older messages, summarised):"]
+        if self.opening:
+            lines.append(f"- Scammer opened with: {self.opening}")
+        details = []
+        for label, values in (("phone", self.intel.phoneNumbers), ("UPI", self.intel.upiIds),
+                              ("account", self.intel.bankAccounts), ("link", self.intel.phishingLinks)):
+            if values:
+                details.append(f"{label}: {', '.join(values[-3:])}")
+        if details:
+            lines.append(f"- Details they already gave: {'; '.join(details)}")
+        if self.recent:
+            lines.append("- Just before the recent messages: " + " | ".join(self.recent))
+        # Drop trailing detail until the summary fits its share of the budget
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+            lines.pop()
+        return "\n".join(lines)
+
+
+class ContextManager:
+    """
+    Builds bounded chat prompts for generate_reply: persona prompt, a rolling summary
+    of older turns, and a window of the most recent messages, trimmed to a token budget.
+    """
+
+    def __init__(self, window: int = CONTEXT_WINDOW, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 cache_size: int = CONTEXT_CACHE_SIZE):
+        self.window = window
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+        self.extractor = IntelExtractor()
+        self._summaries: "OrderedDict[str, RollingSummary]" = OrderedDict()
+
+    def _summary_for(self, session_id: Optional[str], older: List[Message]) -> RollingSummary:
+        summary = self._summaries.get(session_id) if session_id else None
+        if summary is None or summary.covered > len(older):
+            # Unknown session, or the client's history no longer matches what we folded: rebuild
+            summary = RollingSummary()
+        if summary.covered < len(older):
+            summary.fold(older[summary.covered:], self.extractor)
+        if session_id:
+            self._summaries[session_id] = summary
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def build_messages(self, system_prompt: str, history: List[Message], session_id: Optional[str] = None) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": system_prompt}]
+        budget = self.token_budget - message_tokens(messages[0])
+
+        split = max(0, len(history) - self.window)
+        recent = [{"role": _role(msg), "content": msg.text or ""} for msg in history[split:]]
+
+        # Recent messages take priority; the oldest of them go first if the window alone is over budget
+        recent_tokens = [message_tokens(m) for m in recent]
+        while len(recent) > 1 and sum(recent_tokens) > budget:
+            recent.pop(0)
+            recent_tokens.pop(0)
+            split += 1
+        budget -= sum(recent_tokens)
+
+        if split and budget > 20:
+            summary = self._summary_for(session_id, history[:split])
+            messages.append({"role": "system", "content": summary.render(budget - 4)})
+
+        messages.extend(recent)
+        return messages
+
+    def forget(self, session_id: str):
+        self._summaries.pop(session_id, None)
@@ -0,0 +1,216 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from .models import IntelligenceData
+
+# Compiled once at import; every message is scanned a single time per pattern.
+URL_RE = re.compile(r"\b(?:https?://|www\.|bit\.ly/|tinyurl\.com/)[^\s<>\"']+", re.IGNORECASE)
+UPI_RE = re.compile(r"(?<![\w.@-])([a-zA-Z0-9._-]{2,256})@([a-zA-Z]{2,64})\b(?![.@-]?\w)")
+PHONE_RE = re.compile(r"(?<![\d+])(?:\+?91[\s-]?|0)?([6-9]\d{4})[\s-]?(\d{5})(?!\d)")
+# Any number written with a leading +; Indian ones are left to PHONE_RE, the rest are E.164 phones
+PLUS_NUMBER_RE = re.compile(r"(?<![\w+])\+\d(?:[\s-]?\d){5,16}(?!\d)")
+DIGITS_RE = re.compile(r"(?<![\d.+])\d(?:[\d -]{7,22}\d)(?![\d.])")
+# The word nearest before a number says what it is: an account, a card, or some reference
+# (order, OTP, UTR...) that merely looks like one
+CONTEXT_RE = re.compile(
+    r"\b(?:(a/c|acc(?:oun)?t|acc|khata|beneficiary)|(card|debit|credit)"
+    r"|(ref(?:erence)?|order|txn|transaction|utr|otp|tracking|invoice|ticket|complaint))\b",
+    re.IGNORECASE,
+)
+ACCOUNT_CONTEXT_CHARS = 40
+# IFSC: 4-letter bank code, a literal 0, 6-character branch code
+IFSC_RE = re.compile(r"\b(?:(ifsc)\W{0,3})?([A-Za-z]{4}0[A-Za-z0-9]{6})\b", re.IGNORECASE)
+TOLL_FREE_PREFIXES = ("1800", "1860")
+
+SUSPICIOUS_KEYWORDS = [
+    "urgent", "block", "blocked", "verify", "suspend", "suspended", "otp", "kyc", "immediately",
+    "closed", "update", "link", "click", "account", "bank", "upi", "payment", "transfer",
+    "send", "money", "paisa", "rupees", "pin", "cvv", "refund", "lottery", "fee", "penalty",
+]
+KEYWORD_RE = re.compile(r"\b(" + "|".join(map(re.escape, SUSPICIOUS_KEYWORDS)) + r")\b", re.IGNORECASE)
+
+TRAILING_PUNCTUATION = ".,;:!?)]}'\""
+
+
+def luhn_valid(number: str) -> bool:
+    total = 0
+    for i, digit in enumerate(reversed(number)):
+        n = int(digit)
+        if i % 2:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return total % 10 == 0
+
+
+def normalize_phone(national: str) -> str:
+    """
+    Indian mobile number to E.164, e.g. 98765 43210 -> +919876543210.
+    """
+    return "+91" + national
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """
+    Lowercases scheme and host, drops default ports, fragments and trailing punctuation.
+    """
+    url = url.rstrip(TRAILING_PUNCTUATION)
+    if not re.match(r"https?://", url, re.IGNORECASE):
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return None
+    if "." not in host:
+        return None
+    scheme = parts.scheme.lower()
+    netloc = host
+    if port and not (scheme == "http" and port == 80) and not (scheme == "https" and port == 443):
+        netloc = f"{host}:{port}"
+    path = parts.path if parts.path not in ("", "/") else ""
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def normalize_international_phone(raw: str) -> Optional[str]:
+    """
+    +-prefixed non-Indian number to E.164, e.g. +1 415 555 2671 -> +14155552671.
+    """
+    digits = re.sub(r"\D", "", raw)
+    if digits.startswith("91") or not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def valid_ifsc(code: str, labelled: bool) -> Optional[str]:
+    """
+    Upper-cased IFSC if code has the IFSC shape and reads as one: written in capitals
+    as banks print it, or labelled "IFSC". Mixed-case words of the same shape don't count.
+    """
+    if not (labelled or code.isupper()):
+        return None
+    code = code.upper()
+    # Branch codes are numeric or alphanumeric, never all letters
+    if not any(c.isdigit() for c in code[5:]):
+        return None
+    return code
+
+
+def _account_candidate(raw: str, context: Optional[str]) -> Optional[str]:
+    """
+    context is "account", "card", "reference" or None, from the nearest keyword or IFSC.
+    """
+    digits = re.sub(r"[ -]", "", raw)
+    if len(set(digits)) == 1 or not 9 <= len(digits) <= 18:
+        return None
+    # Mobile numbers, and Indian toll-free numbers (1800-123-4567), which are customer care lines
+    if len(digits) == 10 and digits[0] in "6789":
+        return None
+    if digits.startswith(TOLL_FREE_PREFIXES) and len(digits) in (10, 11):
+        return None
+    if context == "account":
+        return digits
+    # Without account context: never a separated group (phone, Aadhaar), never a
+    # 9-11 digit run (OTPs, order and reference numbers), and never a Luhn-valid run,
+    # which is most likely a card number; the report has no field for cards.
+    if context is None and raw == digits and len(digits) >= 12 and not luhn_valid(digits):
+        return digits
+    return None
+
+
+class IntelExtractor:
+    """
+    Deterministic, incremental indicator extraction.
+
+    update() scans one message and merges new indicators into the session's
+    IntelligenceData. The cost depends on the message length, not the session length.
+    """
+
+    def extract(self, text: str, account_context: bool = False) -> IntelligenceData:
+        return self.update(IntelligenceData(), text, account_context)
+
+    def update(self, intel: IntelligenceData, text: str, account_context: bool = False) -> IntelligenceData:
+        """
+        account_context: text is known to be an account number (an LLM-extracted value),
+        so it counts without a nearby "account" or IFSC.
+        """
+        if not text:
+            return intel
+
+        international = []
+
+        def take_international(match: re.Match) -> str:
+            phone = normalize_international_phone(match.group())
+            if phone is None:
+                return match.group()
+            international.append(phone)
+            return " "
+
+        # Non-Indian +numbers are taken out first, so no 10-digit tail of one reads as an Indian mobile
+        text_for_phones = PLUS_NUMBER_RE.sub(take_international, text)
+        phones = [normalize_phone(a + b) for a, b in PHONE_RE.findall(text_for_phones)]
+        phone_digits = {p[3:] for p in phones}
+        phones.extend(international)
+
+        links = [u for u in (canonicalize_url(m) for m in URL_RE.findall(text)) if u]
+        # Spans already claimed by URLs shouldn't also yield UPI IDs (user@host in a link)
+        text_without_urls = URL_RE.sub(" ", text)
+        upi_ids = [f"{handle.lower()}@{psp.lower()}" for handle, psp in UPI_RE.findall(text_without_urls)]
+
+        accounts = []
+        text_for_accounts = PLUS_NUMBER_RE.sub(" ", text_without_urls)
+        # An account number quoted next to a valid IFSC, before or after it, is an account
+        ifsc_spans = [m.span() for m in IFSC_RE.finditer(text_for_accounts) if valid_ifsc(m.group(2), bool(m.group(1)))]
+        for match in DIGITS_RE.finditer(text_for_accounts):
+            context = "account" if account_context else _context(text_for_accounts, match.start())
+            if context is None and any(_near(match.span(), span) for span in ifsc_spans):
+                context = "account"
+            candidate = _account_candidate(match.group(), context)
+            if candidate and candidate not in phone_digits and candidate[-10:] not in phone_digits:
+                accounts.append(candidate)
+
+        keywords = [k.lower() for k in KEYWORD_RE.findall(text)]
+
+        _merge(intel.phoneNumbers, phones)
+        _merge(intel.phishingLinks, links)
+        _merge(intel.upiIds, upi_ids)
+        _merge(intel.bankAccounts, accounts)
+        _merge(intel.suspiciousKeywords, keywords)
+        return intel
+
+    def merge(self, intel: IntelligenceData, other: IntelligenceData) -> IntelligenceData:
+        """
+        Folds LLM-extracted fields into intel, re-validating them through the same normalizers.
+        """
+        for field in ("phoneNumbers", "upiIds", "bankAccounts", "phishingLinks"):
+            for value in getattr(other, field):
+                self.update(intel, str(value), account_context=field == "bankAccounts")
+        _merge(intel.suspiciousKeywords, [str(k).lower() for k in other.suspiciousKeywords])
+        return intel
+
+
+def _context(text: str, position: int) -> Optional[str]:
+    """
+    What the keyword nearest before position says the number there is.
+    """
+    last = None
+    for last in CONTEXT_RE.finditer(text, max(0, position - ACCOUNT_CONTEXT_CHARS), position):
+        pass
+    if last is None:
+        return None
+    return "account" if last.group(1) else "card" if last.group(2) else "reference"
+
+
+def _near(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    return a[0] - b[1] <= ACCOUNT_CONTEXT_CHARS and b[0] - a[1] <= ACCOUNT_CONTEXT_CHARS
+
+
+def _merge(target: List[str], values: Iterable[str]):
+    seen = set(target)
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            target.append(value)
@@ -0,0 +1,337 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .logs import logger
+from .metrics import LLM_CALL_SECONDS, record_llm_usage
+
+# Local requests/tokens-per-minute budgets; set them to the account's tier limits.
+# 0 disables a bucket and leaves throttling to AIMD and the upstream's 429s.
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "64"))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "2"))
+# Past the HTTP pool size (LLM_MAX_CONNECTIONS) extra slots would only queue in httpx
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "100"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Lower runs first when calls queue for a concurrency slot. Each priority level is a
+# head start of LLM_PRIORITY_STEP seconds rather than absolute precedence, so a
+# steady stream of replies can't starve detection or extraction indefinitely.
+PRIORITIES = {"generate_reply": 0, "detect_scam": 1, "extract_intelligence": 2}
+LLM_PRIORITY_STEP = float(os.getenv("LLM_PRIORITY_STEP", "1.0"))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised without calling upstream while the breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_min; acquire() waits until enough capacity is available.
+    """
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0, check: Optional[Callable[[], None]] = None):
+        """
+        check, if given, is called between short sleeps and may raise to abandon the wait.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            wait = (amount - self.tokens) / self.rate
+            await asyncio.sleep(min(wait, 0.1) if check else wait)
+            if check:
+                check()
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        """
+        Takes amount if it is available right now, without waiting.
+        """
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit with AIMD: +1 per window of successes, halved on overload.
+    Waiters are served by arrival time minus priority * priority_step.
+    """
+
+    def __init__(self, initial: int = LLM_CONCURRENCY, minimum: int = LLM_CONCURRENCY_MIN,
+                 maximum: int = LLM_CONCURRENCY_MAX, priority_step: float = LLM_PRIORITY_STEP):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.priority_step = priority_step
+        self.in_flight = 0
+        self._waiters: List = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        deadline = time.monotonic() + priority * self.priority_step
+        heapq.heappush(self._waiters, (deadline, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A slot may have been handed over just as we were cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def fail_waiters(self, error: Exception):
+        """
+        Wakes every queued caller with error instead of a slot.
+        """
+        waiters, self._waiters = self._waiters, []
+        for _, _, future in waiters:
+            if not future.done():
+                future.set_exception(error)
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_overload(self):
+        self.limit = max(self.minimum, self.limit / 2)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive upstream failures; after `cooldown` seconds a
+    single probe call is let through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether a call made now would be let through.
+        """
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.probing)
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None or self.probing:
+                logger.warning(f"LLM circuit opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Delay requested by the upstream via retry-after-ms / retry-after headers.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """
+    Single path for every upstream LLM call: rate limits, adaptive concurrency with
+    priorities, Retry-After aware retries and a circuit breaker.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_retries: int = LLM_MAX_RETRIES,
+                 limiter: Optional[AdaptiveLimiter] = None, breaker: Optional[CircuitBreaker] = None):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.paused_until = 0.0
+        self.counters = {"calls": 0, "retries": 0, "rateLimited": 0, "failures": 0, "shortCircuited": 0}
+
+    async def call(self, method: str, fn: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """
+        Runs fn() (which makes one upstream request) under the gateway's controls.
+        Raises CircuitOpenError immediately while upstream is considered unhealthy.
+        """
+        # Imported here, not at module load: the SDK is already loaded by the time fn can run
+        import openai
+        priority = PRIORITIES.get(method, 1)
+        last_error: Optional[Exception] = None
+        backoff = 0.0
+        for attempt in range(self.max_retries + 1):
+            # After a transient failure; slept here, with no concurrency slot or probe held
+            if backoff:
+                await asyncio.sleep(backoff)
+                backoff = 0.0
+            if not self.breaker.allow():
+                self.counters["shortCircuited"] += 1
+                raise CircuitOpenError(f"LLM circuit open, skipping {method}")
+            if attempt:
+                self.counters["retries"] += 1
+
+            # Set when this attempt took the half-open probe
+            probe = self.breaker.probing
+            try:
+                # A 429 pauses everyone, not just the caller that saw it
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                # Waits below give up as soon as the breaker opens, so queued calls fall back at once
+                check = lambda: self._check_open(method)
+                try:
+                    if self.requests is not None:
+                        await self.requests.acquire(1, check=check)
+                    if self.tokens is not None:
+                        await self.tokens.acquire(tokens, check=check)
+                    await self.limiter.acquire(priority)
+                except CircuitOpenError:
+                    self.counters["shortCircuited"] += 1
+                    raise
+                self.counters["calls"] += 1
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await fn()
+                except openai.RateLimitError as e:
+                    outcome = "rate_limited"
+                    last_error = e
+                    self.counters["rateLimited"] += 1
+                    self.limiter.on_overload()
+                    delay = retry_after_seconds(e) or self._backoff(attempt)
+                    self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                    # Rate limiting says nothing about upstream health; release a half-open probe
+                    self.breaker.probing = False
+                    continue
+                except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+                    last_error = e
+                    self.counters["failures"] += 1
+                    self.breaker.record_failure()
+                    self.limiter.on_overload()
+                    if self.breaker.state == "open":
+                        self.limiter.fail_waiters(CircuitOpenError(f"LLM circuit open, skipping {method}"))
+                    if attempt < self.max_retries:
+                        backoff = self._backoff(attempt)
+                    continue
+                except Exception:
+                    # Client-side errors (bad request, auth) aren't retried and don't trip the breaker
+                    outcome = "client_error"
+                    self.breaker.probing = False
+                    raise
+                else:
+                    outcome = "ok"
+                    self.breaker.record_success()
+                    self.limiter.on_success()
+                    # Streams carry usage in their last chunk; the caller records that one
+                    if getattr(result, "usage", None) is not None:
+                        record_llm_usage(result.model, result.usage)
+                    return result
+                finally:
+                    self.limiter.release()
+                    LLM_CALL_SECONDS.observe(time.perf_counter() - start, method=method, outcome=outcome)
+            except asyncio.CancelledError:
+                # A cancelled probe settles nothing; release it, or the circuit stays
+                # half-open with every later call short-circuited
+                if probe:
+                    self.breaker.probing = False
+                raise
+        raise last_error
+
+    def _check_open(self, method: str):
+        if self.breaker.state == "open":
+            raise CircuitOpenError(f"LLM circuit open, skipping {method}")
+
+    def _backoff(self, attempt: int) -> float:
+        return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrencyLimit": round(self.limiter.limit, 2),
+            "inFlight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting,
+            "circuit": self.breaker.state,
+            **self.counters,
+        }
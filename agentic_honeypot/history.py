@@ -0,0 +1,71 @@
+import hashlib
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from .models import Message
+
+# State of an empty history; also what a delta-aware client sends with its first message
+EMPTY_HISTORY = ""
+
+
+class Turn(NamedTuple):
+    """
+    One stored message. Same sender/text/timestamp attributes as Message, at a
+    fraction of the memory, so stored history can be passed where messages are read.
+    """
+    sender: str
+    text: str
+    timestamp: str
+
+    @classmethod
+    def from_message(cls, msg: Message) -> "Turn":
+        return cls(msg.sender or "unknown", msg.text or "", msg.timestamp or "")
+
+
+def _step(digest: str, sender: str, text: str) -> str:
+    # Timestamps are left out: clients re-stamp our replies when they echo them back
+    data = f"{digest}\x1e{sender}\x1f{text}".encode("utf-8")
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def parse_state(state: str) -> Tuple[int, str]:
+    """
+    Splits a history state "<count>:<digest>" into its parts.
+    """
+    if not state:
+        return 0, ""
+    count, _, digest = state.partition(":")
+    try:
+        return int(count), digest
+    except ValueError:
+        return -1, ""
+
+
+def extend_state(state: str, messages: Sequence) -> str:
+    """
+    Rolling hash: the state after appending messages to a history in state.
+    """
+    count, digest = parse_state(state)
+    for msg in messages:
+        digest = _step(digest, msg.sender or "unknown", msg.text or "")
+    count += len(messages)
+    return f"{count}:{digest}" if count else EMPTY_HISTORY
+
+
+def reconcile(state: str, incoming: List[Message]) -> Tuple[str, List[Message]]:
+    """
+    Compares a client-sent full history with the stored history's state.
+
+    Returns ("match", []) when they are the same, ("extended", tail) when incoming
+    is the stored history plus tail, or ("diverged", incoming) when it differs.
+    """
+    count, digest = parse_state(state)
+    if count < 0 or len(incoming) < count:
+        return "diverged", incoming
+    if extend_state(EMPTY_HISTORY, incoming[:count]) != state:
+        return "diverged", incoming
+    tail = incoming[count:]
+    return ("extended", tail) if tail else ("match", [])
+
+
+def to_turns(messages: Optional[Sequence[Message]]) -> List[Turn]:
+    return [Turn.from_message(m) for m in messages or []]
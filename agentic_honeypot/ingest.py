@@ -0,0 +1,97 @@
+import os
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel, ValidationError
+
+from .models import IncomingMessage
+from .logs import logger
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used without it
+    orjson = None
+
+# Largest request body accepted, in bytes. A 1000-message history is ~250 KB.
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(1024 * 1024)))
+MAX_BATCH_BODY_BYTES = int(os.getenv("MAX_BATCH_BODY_BYTES", str(16 * 1024 * 1024)))
+
+
+class PayloadTooLarge(Exception):
+    """
+    The request body is over the size cap; answered with 413.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(f"Request body exceeds {limit} bytes")
+        self.limit = limit
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dumps(obj) -> str:
+    return orjson.dumps(obj).decode("utf-8") if orjson is not None else json.dumps(obj)
+
+
+async def read_body(request: Request, limit: int = MAX_BODY_BYTES) -> bytes:
+    """
+    Reads the body once, giving up as soon as it passes limit (or Content-Length says it will).
+    """
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise PayloadTooLarge(limit)
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise PayloadTooLarge(limit)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_message(body: bytes) -> IncomingMessage:
+    """
+    Validates the body straight from JSON bytes. Empty bodies and JSON that isn't
+    an object are accepted as an empty message, as before; invalid JSON raises ValueError.
+    """
+    if not body.strip():
+        return IncomingMessage()
+    try:
+        return IncomingMessage.model_validate_json(body)
+    except ValidationError:
+        # Slow path only for bodies the strict parse rejects: find out whether it was
+        # well-formed JSON of the wrong shape, or fields with bad values
+        data = loads(body)
+        if not isinstance(data, dict):
+            logger.warning(f"Payload is not a dict: {type(data)}")
+            return IncomingMessage()
+        return IncomingMessage.model_validate(data)
+
+
+def parse_item(item: Any) -> Optional[IncomingMessage]:
+    """
+    One batch entry, as raw NDJSON bytes or an already decoded object; None if invalid,
+    including an explicit "message": null, which leaves nothing to analyze.
+    """
+    try:
+        if isinstance(item, (bytes, str)):
+            data = IncomingMessage.model_validate_json(item)
+        elif isinstance(item, dict):
+            data = IncomingMessage.model_validate(item)
+        else:
+            return None
+    except ValueError:
+        return None
+    return data if data.message is not None else None
+
+
+def model_response(model: BaseModel, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serializes a response model in pydantic-core, skipping FastAPI's re-validation
+    and jsonable_encoder pass. Fields that are None are left out.
+    """
+    return Response(model.model_dump_json(exclude_none=True), media_type="application/json", headers=headers)
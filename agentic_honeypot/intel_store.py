@@ -0,0 +1,297 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .models import IntelligenceData
+from .extractor import IntelExtractor
+from .logs import logger
+
+# Cross-session indicator store: "sqlite" (default) or "off"
+INTEL_STORE = os.getenv("INTEL_STORE", "sqlite")
+INTEL_DB_PATH = os.getenv("INTEL_DB_PATH", "intel.db")
+# Sightings are written in batches by one background task: up to INTEL_BATCH_SIZE
+# rows at a time, at least every INTEL_FLUSH_INTERVAL seconds
+INTEL_BATCH_SIZE = int(os.getenv("INTEL_BATCH_SIZE", "500"))
+INTEL_FLUSH_INTERVAL = float(os.getenv("INTEL_FLUSH_INTERVAL", "0.5"))
+INTEL_QUEUE_SIZE = int(os.getenv("INTEL_QUEUE_SIZE", "100000"))
+
+# IntelligenceData fields that identify a scammer; keywords don't, so they aren't stored
+INDICATOR_FIELDS = ("upiIds", "phoneNumbers", "bankAccounts", "phishingLinks")
+
+Sighting = Tuple[str, str, str, float, Optional[str]]  # kind, value, session_id, seen_at, domain
+
+_extractor = IntelExtractor()
+
+
+def link_domain(url: str) -> Optional[str]:
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
+def canonical_indicator(kind: str, value: str) -> str:
+    """
+    A query value in the form the extractor stores it (+91 phone numbers, lower-case
+    UPI IDs, canonical URLs), so lookups match however the caller wrote it.
+    """
+    if kind not in INDICATOR_FIELDS:
+        raise ValueError(f"Unknown indicator type {kind!r}; expected one of {', '.join(INDICATOR_FIELDS)}")
+    found = getattr(_extractor.extract(value, account_context=kind == "bankAccounts"), kind)
+    return found[0] if found else value.strip()
+
+
+def new_indicators(intel: IntelligenceData, before: Dict[str, int]) -> Dict[str, List[str]]:
+    """
+    Indicators added to intel since before (field -> list length) was taken.
+    """
+    return {field: getattr(intel, field)[before.get(field, 0):] for field in INDICATOR_FIELDS
+            if len(getattr(intel, field)) > before.get(field, 0)}
+
+
+def indicator_counts(intel: IntelligenceData) -> Dict[str, int]:
+    return {field: len(getattr(intel, field)) for field in INDICATOR_FIELDS}
+
+
+class IntelStore:
+    """
+    Interface for the cross-session indicator store. This base class stores nothing
+    (INTEL_STORE=off): lookups find no earlier sessions and queries come back empty.
+    """
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def record(self, session_id: str, indicators: Dict[str, List[str]]):
+        """
+        Queues indicators seen in a scam session; never waits on disk.
+        """
+
+    async def known(self, session_id: str, indicators: Dict[str, List[str]]) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Which of these indicators earlier sessions already used: field -> value -> session ids.
+        """
+        return {}
+
+    async def sessions_for(self, kind: str, value: str, limit: int = 100) -> List[Dict]:
+        return []
+
+    async def top_domains(self, window: float = 3600.0, limit: int = 10) -> List[Dict]:
+        return []
+
+    def stats(self) -> Dict:
+        return {"enabled": False}
+
+
+class SQLiteIntelStore(IntelStore):
+    """
+    Append-only sightings in a WAL-mode SQLite file.
+
+    Each (indicator, session) pair is stored once, under a primary key of
+    (kind, value, session_id). That key is the inverted index: all sessions for a
+    UPI ID are one range scan. Secondary indexes on (kind, value, seen_at) and
+    (kind, seen_at, domain) serve newest-first listings and time-window queries. Writes go through a queue to a single batching task. Reads
+    use their own connection, so they don't wait behind a batch.
+    """
+
+    def __init__(self, path: str = INTEL_DB_PATH, batch_size: int = INTEL_BATCH_SIZE,
+                 flush_interval: float = INTEL_FLUSH_INTERVAL, queue_size: int = INTEL_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        # Opened by start() or the first query, so importing the service creates no files
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self.counters = {"recorded": 0, "written": 0, "batches": 0, "dropped": 0, "knownHits": 0}
+
+    async def start(self):
+        await asyncio.to_thread(self._connect)
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """
+        Writes whatever is still queued, then closes the database.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Also covers sightings recorded without start(), e.g. from scripts
+        rows = self._drain(self.queue.qsize())
+        if rows:
+            await self._write_batch(rows)
+        await asyncio.to_thread(self._close)
+
+    def _connect(self):
+        with self._connect_lock:
+            if self._reader is not None:
+                return
+            writer = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            writer.execute("PRAGMA journal_mode=WAL")
+            writer.execute("PRAGMA synchronous=NORMAL")
+            writer.execute(
+                "CREATE TABLE IF NOT EXISTS sightings ("
+                " kind TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " session_id TEXT NOT NULL,"
+                " seen_at REAL NOT NULL,"
+                " domain TEXT,"
+                " PRIMARY KEY (kind, value, session_id)) WITHOUT ROWID"
+            )
+            writer.execute("CREATE INDEX IF NOT EXISTS sightings_recent ON sightings (kind, seen_at, domain)")
+            # Newest sessions for an indicator without sorting all of its sightings
+            writer.execute("CREATE INDEX IF NOT EXISTS sightings_latest ON sightings (kind, value, seen_at)")
+            self._writer = writer
+            self._reader = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+
+    def _close(self):
+        with self._connect_lock:
+            if self._reader is None:
+                return
+            with self._write_lock:
+                self._writer.close()
+            with self._read_lock:
+                self._reader.close()
+            self._writer = self._reader = None
+
+    def record(self, session_id: str, indicators: Dict[str, List[str]]):
+        now = time.time()
+        for kind, values in indicators.items():
+            for value in values:
+                domain = link_domain(value) if kind == "phishingLinks" else None
+                try:
+                    self.queue.put_nowait((kind, value, session_id, now, domain))
+                except asyncio.QueueFull:
+                    self.counters["dropped"] += 1
+                    logger.warning("Intel store queue full, dropping sighting")
+                    return
+                self.counters["recorded"] += 1
+
+    def _drain(self, limit: int) -> List[Sighting]:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return rows
+
+    async def _flush_loop(self):
+        rows: List[Sighting] = []
+        try:
+            while True:
+                rows = [await self.queue.get()]
+                # Let a batch build up, unless it fills first
+                deadline = time.monotonic() + self.flush_interval
+                while len(rows) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        rows.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                    rows.extend(self._drain(self.batch_size - len(rows)))
+                await self._write_batch(rows)
+                rows = []
+        except asyncio.CancelledError:
+            # Shutting down: write the batch in hand and whatever is still queued
+            rows.extend(self._drain(self.queue.qsize()))
+            if rows:
+                await self._write_batch(rows)
+            raise
+
+    async def _write_batch(self, rows: List[Sighting]):
+        try:
+            await self._write(rows)
+        except sqlite3.Error as e:
+            logger.error(f"Intel store write of {len(rows)} sightings failed: {e}")
+
+    async def _write(self, rows: List[Sighting]):
+        def write():
+            self._connect()
+            with self._write_lock:
+                self._writer.execute("BEGIN")
+                try:
+                    # A session repeating an indicator keeps its first sighting
+                    self._writer.executemany(
+                        "INSERT OR IGNORE INTO sightings (kind, value, session_id, seen_at, domain) VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._writer.execute("COMMIT")
+                except BaseException:
+                    self._writer.execute("ROLLBACK")
+                    raise
+        await asyncio.to_thread(write)
+        self.counters["written"] += len(rows)
+        self.counters["batches"] += 1
+
+    async def _read(self, fn, *args):
+        def locked():
+            self._connect()
+            with self._read_lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    async def known(self, session_id: str, indicators: Dict[str, List[str]], sample: int = 5) -> Dict[str, Dict[str, List[str]]]:
+        def lookup():
+            found: Dict[str, Dict[str, List[str]]] = {}
+            for kind, values in indicators.items():
+                for value in values:
+                    rows = self._reader.execute(
+                        "SELECT session_id FROM sightings WHERE kind = ? AND value = ? AND session_id != ? LIMIT ?",
+                        (kind, value, session_id, sample),
+                    ).fetchall()
+                    if rows:
+                        found.setdefault(kind, {})[value] = [r[0] for r in rows]
+            return found
+        if not indicators:
+            return {}
+        found = await self._read(lookup)
+        self.counters["knownHits"] += sum(len(v) for v in found.values())
+        return found
+
+    async def sessions_for(self, kind: str, value: str, limit: int = 100) -> List[Dict]:
+        value = canonical_indicator(kind, value)
+        rows = await self._read(lambda: self._reader.execute(
+            "SELECT session_id, seen_at FROM sightings WHERE kind = ? AND value = ? ORDER BY seen_at DESC LIMIT ?",
+            (kind, value, limit),
+        ).fetchall())
+        return [{"sessionId": session_id, "firstSeen": seen_at} for session_id, seen_at in rows]
+
+    async def top_domains(self, window: float = 3600.0, limit: int = 10) -> List[Dict]:
+        # Sessions, not sightings: one session can post several links on the same domain
+        rows = await self._read(lambda: self._reader.execute(
+            "SELECT domain, COUNT(DISTINCT session_id) AS sessions FROM sightings"
+            " WHERE kind = 'phishingLinks' AND seen_at > ? AND domain IS NOT NULL"
+            " GROUP BY domain ORDER BY sessions DESC, domain LIMIT ?",
+            (time.time() - window, limit),
+        ).fetchall())
+        return [{"domain": domain, "sessions": sessions} for domain, sessions in rows]
+
+    def stats(self) -> Dict:
+        return {"enabled": True, "queueDepth": self.queue.qsize(), **self.counters}
+
+
+def create_intel_store(kind: str = INTEL_STORE) -> IntelStore:
+    """
+    Builds the store selected by INTEL_STORE (sqlite or off).
+    """
+    if kind == "sqlite":
+        return SQLiteIntelStore()
+    if kind == "off":
+        return IntelStore()
+    raise ValueError(f"Unknown INTEL_STORE: {kind}")
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+# Fraction of requests that get an access log line and body preview; errors are always logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_BODY_PREVIEW = int(os.getenv("LOG_BODY_PREVIEW", "256"))  # bytes, 0 disables body logging
+
+REDACTED_HEADERS = {"x-api-key", "authorization", "cookie", "set-cookie"}
+
+logger = logging.getLogger("honeypot")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Structured context goes in extra={"fields": {...}}.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(stream=None):
+    """
+    Routes the 'honeypot' logger through a queue so request handlers never block on
+    the write; a background listener thread does the actual output. Idempotent.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=10000)
+    logger.handlers = [_DroppingQueueHandler(log_queue)]
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Flushes queued records and stops the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    # If output can't keep up, drop log lines rather than stall requests
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def redact_headers(headers) -> dict:
+    return {k: ("***" if k.lower() in REDACTED_HEADERS else v) for k, v in headers.items()}
+
+
+def body_preview(body: bytes, limit: Optional[int] = None) -> str:
+    limit = LOG_BODY_PREVIEW if limit is None else limit
+    if limit <= 0:
+        return ""
+    preview = body[:limit].decode("utf-8", errors="replace")
+    if len(body) > limit:
+        preview += f"...(+{len(body) - limit} bytes)"
+    return preview
+
+
+def is_sampled(request) -> bool:
+    """
+    Whether RequestLogMiddleware picked this request for detailed logging.
+    """
+    return bool(getattr(request.state, "log_sampled", False))
+
+
+class RequestLogMiddleware:
+    """
+    Pure ASGI access logging: one structured line per sampled request, written after
+    the response, with redacted headers. The body is not read here; handlers that
+    already have it call body_preview() themselves.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE
+        scope.setdefault("state", {})["log_sampled"] = sampled
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if sampled or status["code"] >= 500:
+                fields = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "durationMs": round((time.perf_counter() - start) * 1000, 2),
+                }
+                if sampled:
+                    headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+                    fields["headers"] = redact_headers(headers)
+                # Server errors are logged above INFO so they survive LOG_LEVEL=WARNING
+                logger.log(logging.ERROR if status["code"] >= 500 else logging.INFO, "request", extra={"fields": fields})
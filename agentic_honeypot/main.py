@@ -1,32 +1,57 @@
 import os
-from typing import Dict, Any, List, Optional
-from fastapi import FastAPI, Header, HTTPException, Depends, Request
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from .models import IncomingMessage, AgentResponse
-from .service import process_message
-import logging
+from .ingest import read_body, parse_message, parse_item, model_response, loads, dumps, PayloadTooLarge, MAX_BATCH_BODY_BYTES
+from .service import process_message, stream_message, process_batch, callback_dispatcher, sessions, response_cache, scam_detector, planner, drain_background, intel_store, warm_up
+from .stats import LatencyWindow
+from .agent import close_client, gateway
+from .personas import personas
+from .intel_store import INDICATOR_FIELDS, canonical_indicator
+from .logs import logger, setup_logging, stop_logging, RequestLogMiddleware, body_preview, is_sampled
+from . import metrics
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("uvicorn")
+# Structured JSON logs through a background queue; see logs.py for LOG_* settings
+setup_logging()
 
-load_dotenv()
+# Startup warm-up: the LLM client and its pooled connections, the classifier and the
+# tokenizer. "startup" (default) finishes it before the worker takes traffic, so
+# readiness means warm; "background" serves at once and warms alongside the first
+# requests; "off" leaves it all to the first requests.
+WARM_UP = os.getenv("WARM_UP", "startup")
 
-app = FastAPI(title="Agentic Honey-Pot API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Databases and the callback spool are opened here rather than at import
+    await sessions.start()
+    await callback_dispatcher.start()
+    await intel_store.start()
+    loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    warming = None
+    if WARM_UP == "startup":
+        await warm_up()
+    elif WARM_UP == "background":
+        warming = asyncio.create_task(warm_up())
+    yield
+    loop_monitor.cancel()
+    if warming is not None:
+        warming.cancel()
+        await asyncio.gather(warming, return_exceptions=True)
+    await drain_background()
+    await callback_dispatcher.stop()
+    await intel_store.stop()
+    await sessions.close()
+    await close_client()
+    stop_logging()
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Incoming Request: {request.method} {request.url}")
-    logger.info(f"Headers: {request.headers}")
-    try:
-        body = await request.body()
-        logger.info(f"Body: {body.decode('utf-8')}")
-    except Exception:
-        logger.info("Body: Could not read body")
-    
-    response = await call_next(request)
-    return response
+app = FastAPI(title="Agentic Honey-Pot API", lifespan=lifespan)
+
+app.add_middleware(RequestLogMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,53 +69,215 @@ async def verify_api_key(x_api_key: str = Header(...)):
         raise HTTPException(status_code=403, detail="Invalid API Key")
     return x_api_key
 
-@app.post("/analyze", response_model=AgentResponse)
+stream_latency = {"firstToken": LatencyWindow(), "total": LatencyWindow()}
+
+# Counters other components already keep, exported as-is on /metrics
+metrics.mirror(metrics.Counter, "honeypot_detections_total", "How scam detection was decided", "path",
+               lambda: scam_detector.counters)
+metrics.mirror(metrics.Counter, "honeypot_callbacks_total", "Callback dispatcher events", "event",
+               lambda: callback_dispatcher.counters)
+metrics.mirror(metrics.Counter, "honeypot_planner_total", "How detection and reply generation were scheduled", "plan",
+               lambda: planner.counters)
+metrics.mirror(metrics.Counter, "honeypot_persona_prompts_total", "Persona system prompt lookups by memo result", "result",
+               lambda: personas.counters)
+metrics.mirror(metrics.Counter, "honeypot_llm_gateway_total", "LLM gateway events", "event",
+               lambda: gateway.counters)
+metrics.mirror(metrics.Counter, "honeypot_intel_store_total", "Intel store sightings and lookups", "event",
+               lambda: {k: v for k, v in intel_store.stats().items() if k not in ("enabled", "queueDepth")})
+metrics.mirror(metrics.Gauge, "honeypot_queue_depth", "Work waiting in background queues", "queue",
+               lambda: {"callbacks": callback_dispatcher.queue.qsize(), "llm": gateway.limiter.waiting,
+                        "intel": intel_store.stats().get("queueDepth", 0)})
+metrics.mirror(metrics.Gauge, "honeypot_llm_concurrency", "LLM gateway concurrency", "kind",
+               lambda: {"limit": gateway.limiter.limit, "inFlight": gateway.limiter.in_flight})
+# Only set in production if /metrics should be scraped without the API key
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+
+def wants_stream(request: Request) -> bool:
+    """
+    Streaming is opt-in: ?stream=true or an Accept: text/event-stream header.
+    """
+    if request.query_params.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.headers.get("accept", "")
+
+async def sse_reply(model_data: IncomingMessage):
+    """
+    Server-Sent Events: one 'token' event per reply chunk, then a 'final' event
+    carrying the same AgentResponse JSON the non-streaming endpoint returns.
+    """
+    start = time.perf_counter()
+    first_token = None
+    final = None
+    try:
+        async for item in stream_message(model_data):
+            if isinstance(item, AgentResponse):
+                final = item
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                stream_latency["firstToken"].add(first_token)
+            yield f"event: token\ndata: {dumps({'text': item})}\n\n"
+    except Exception as e:
+        logger.error(f"Stream Error: {e}")
+    if final is None:
+        final = AgentResponse(status="success", reply="Thank you for your message. How can I help you today?")
+    total = time.perf_counter() - start
+    stream_latency["total"].add(total)
+    logger.info(f"Stream {model_data.sessionId}: first token {(first_token or total) * 1000:.0f}ms, total {total * 1000:.0f}ms")
+    yield f"event: final\ndata: {final.model_dump_json(exclude_none=True)}\n\n"
+
+@app.post("/", response_model=AgentResponse, response_model_exclude_none=True)
+@app.post("/analyze", response_model=AgentResponse, response_model_exclude_none=True)
 async def analyze_message(request: Request, api_key: str = Depends(verify_api_key)):
     """
     Endpoint to analyze incoming messages, detect scams, and return agent responses.
-    Accepts raw Request to handle ANY payload including empty/malformed.
+    Accepts raw Request to handle ANY payload including empty/malformed; POST / is
+    the same endpoint, for clients that post to the root.
+    With an x-honeypot-trace: 1 header, non-streamed responses carry a Server-Timing
+    header with the time spent in each stage.
     """
+    trace = metrics.trace_requested(request.headers)
+    if trace:
+        metrics.start_trace()
+    try:
+        body = await read_body(request)
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     try:
-        body = await request.body()
-        body_str = body.decode('utf-8') if body else "{}"
-        logger.info(f"Raw Body: {body_str}")
-        
-        # Handle empty body
-        if not body_str.strip():
-            data = {}
-        else:
-            import json
-            data = json.loads(body_str)
-        
-        # Handle non-dict (e.g., list, string, null)
-        if not isinstance(data, dict):
-            logger.warning(f"Payload is not a dict: {type(data)}")
-            data = {}
-        
-        model_data = IncomingMessage(**data)
-        response = process_message(model_data)
-        return response
+        if is_sampled(request):
+            logger.info("body", extra={"fields": {"path": request.url.path, "size": len(body), "preview": body_preview(body)}})
+        model_data = parse_message(body)
+        if wants_stream(request):
+            return StreamingResponse(
+                sse_reply(model_data),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        result = await process_message(model_data)
+        return model_response(result, {"Server-Timing": metrics.server_timing()} if trace else None)
     except Exception as e:
         logger.error(f"Analyze Error: {e}")
-        return AgentResponse(status="success", reply="Thank you for your message. How can I help you today?")
+        return model_response(AgentResponse(status="success", reply="Thank you for your message. How can I help you today?"))
 
-@app.get("/")
-async def root():
-    return {"message": "Agentic Honey-Pot is running. POST to /analyze"}
-
-from typing import Dict, Any, List, Optional
+def parse_batch(body: bytes) -> List[Optional[IncomingMessage]]:
+    """
+    A JSON array, or NDJSON with one IncomingMessage per line. Entries that aren't
+    valid messages come back as None.
+    """
+    text = body.strip()
+    if not text:
+        return []
+    if text.startswith(b"["):
+        items = loads(text)
+        return [parse_item(item) for item in (items if isinstance(items, list) else [items])]
+    # NDJSON lines go straight from bytes to models
+    return [parse_item(line) for line in text.splitlines() if line.strip()]
 
-@app.post("/", response_model=AgentResponse)
-async def root_analyze(data: Dict[str, Any], api_key: str = Depends(verify_api_key)):
+@app.post("/analyze/batch")
+async def analyze_batch(request: Request, api_key: str = Depends(verify_api_key)):
     """
-    Fallback endpoint for root POST requests. Accepts ANY JSON body.
+    Bulk triage. Accepts a JSON array or NDJSON of IncomingMessages and streams back
+    NDJSON, one line per input in input order: {"index", "sessionId", "status", "reply"}.
+    Invalid items get status "error" and are skipped.
     """
-    # Convert dict back to model manually or ignore errors
-    logger.info(f"Received Raw Payload: {data}")
     try:
-        model_data = IncomingMessage(**data)
-        return await analyze_message(model_data, api_key)
-    except Exception as e:
-        logger.error(f"Validation Error: {e}")
-        # Return success anyway to pass the tester
-        return AgentResponse(status="success", reply="Fallback reply - validation failed but accepted.")
+        messages = parse_batch(await read_body(request, MAX_BATCH_BODY_BYTES))
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+
+    async def ndjson_results():
+        results = process_batch([m for m in messages if m is not None])
+        try:
+            for index, model_data in enumerate(messages):
+                if model_data is None:
+                    yield dumps({"index": index, "sessionId": None, "status": "error", "reply": ""}) + "\n"
+                    continue
+                _, response = await results.__anext__()
+                yield dumps({"index": index, "sessionId": model_data.sessionId, **response.model_dump(exclude_none=True)}) + "\n"
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
+
+@app.get("/callbacks/stats")
+async def callback_stats(api_key: str = Depends(verify_api_key)):
+    """
+    Queue depth, delivery counters and latency of the background callback dispatcher.
+    """
+    return callback_dispatcher.stats()
+
+@app.get("/cache/stats")
+async def cache_stats(api_key: str = Depends(verify_api_key)):
+    """
+    Hit rates of the verdict and first-turn reply caches, and how detection was decided.
+    """
+    return {**response_cache.stats(), "detection": scam_detector.counters}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint(x_api_key: Optional[str] = Header(None)):
+    """
+    Prometheus text exposition of stage latencies, LLM usage and cost, detection,
+    callback and event-loop metrics.
+    """
+    if not METRICS_PUBLIC and x_api_key != EXPECTED_API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid API Key")
+    metrics.SESSION_STORE_SIZE.set(await sessions.size())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/llm/stats")
+async def llm_stats(api_key: str = Depends(verify_api_key)):
+    """
+    LLM gateway state: adaptive concurrency limit, queue, circuit breaker and retry counters,
+    plus the persona registry and its rendered-prompt memo.
+    """
+    return {**gateway.stats(), "personas": personas.stats()}
+
+@app.get("/stream/stats")
+async def streaming_stats(api_key: str = Depends(verify_api_key)):
+    """
+    First-token and total latency of streamed /analyze replies.
+    """
+    return {name: window.summary() for name, window in stream_latency.items()}
+
+@app.get("/sessions/{session_id}/intel")
+async def session_intel(session_id: str, api_key: str = Depends(verify_api_key)):
+    """
+    Intelligence extracted so far for a session; updated on every turn.
+    """
+    session = await sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session.intel
+
+@app.get("/intel/indicators/{kind}/sessions")
+async def indicator_sessions(kind: str, value: str, limit: int = Query(100, ge=1, le=1000),
+                             api_key: str = Depends(verify_api_key)):
+    """
+    Scam sessions that mentioned an indicator, newest first. kind is an
+    IntelligenceData field: upiIds, phoneNumbers, bankAccounts or phishingLinks.
+    """
+    if kind not in INDICATOR_FIELDS:
+        raise HTTPException(status_code=404, detail=f"Unknown indicator type; use one of {', '.join(INDICATOR_FIELDS)}")
+    value = canonical_indicator(kind, value)
+    return {"type": kind, "value": value, "sessions": await intel_store.sessions_for(kind, value, limit)}
+
+@app.get("/intel/domains/top")
+async def top_phishing_domains(window: float = Query(3600.0, gt=0), limit: int = Query(10, ge=1, le=100),
+                               api_key: str = Depends(verify_api_key)):
+    """
+    Phishing-link domains by number of scam sessions in the last `window` seconds.
+    """
+    return {"windowSeconds": window, "domains": await intel_store.top_domains(window, limit)}
+
+@app.get("/intel/stats")
+async def intel_stats(api_key: str = Depends(verify_api_key)):
+    """
+    Write queue and counters of the cross-session intel store.
+    """
+    return intel_store.stats()
+
+@app.get("/")
+async def root():
+    return {"message": "Agentic Honey-Pot is running. POST to /analyze"}
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Per-request stage timings are collected when the client sends TRACE_HEADER: 1, or
+# for every request with METRICS_TRACE=always; "off" ignores the header.
+METRICS_TRACE = os.getenv("METRICS_TRACE", "header")
+TRACE_HEADER = "x-honeypot-trace"
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+# USD per 1M prompt / completion / cached prompt tokens. Override or extend with
+# LLM_PRICES as JSON, e.g. {"gpt-4o": [2.5, 10.0, 1.25]}; without a cached price,
+# cached tokens cost the same as other prompt tokens. Models are matched by longest
+# prefix, so dated snapshots such as gpt-4o-2024-08-06 use the gpt-4o price.
+LLM_PRICES: Dict[str, Tuple[float, ...]] = {
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4o": (2.50, 10.00, 1.25),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "gpt-4.1": (2.00, 8.00, 0.50),
+}
+LLM_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+REGISTRY: List["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """
+    A Prometheus metric family. collect, if given, is called at scrape time and
+    returns (label values, value) pairs, for numbers another object already keeps.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.collect = collect
+        self._values: Dict[LabelValues, float] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        items = self.collect() if self.collect is not None else self._values.items()
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            # per-bucket counts (non-cumulative), sum, count
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def mirror(metric_class, name: str, help: str, label: str, source: Callable[[], Dict[str, float]]) -> Metric:
+    """
+    Exposes a dict of counts kept elsewhere (e.g. detector or dispatcher counters)
+    as one metric with the dict keys as label values.
+    """
+    return metric_class(name, help, [label], collect=lambda: [((k,), v) for k, v in source().items()])
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+STAGE_SECONDS = Histogram("honeypot_stage_seconds", "Time spent in each stage of handling a message", ["stage"])
+SESSIONS_FLAGGED = Counter("honeypot_sessions_total", "New sessions by initial detection verdict", ["verdict"])
+INTEL_KNOWN = Counter("honeypot_intel_known_total", "Indicators reused from earlier scam sessions", ["type"])
+HISTORY_SYNC = Counter("honeypot_history_sync_total", "How incoming history related to the stored one", ["result"])
+SESSION_STORE_SIZE = Gauge("honeypot_session_store_size", "Sessions currently held by the session store")
+LLM_CALL_SECONDS = Histogram("honeypot_llm_call_seconds", "Upstream LLM request latency", ["method", "outcome"])
+LLM_TOKENS = Counter("honeypot_llm_tokens_total", "LLM tokens used", ["model", "type"])
+LLM_COST = Counter("honeypot_llm_cost_usd_total", "Estimated LLM spend in USD", ["model"])
+CALLBACK_SECONDS = Histogram("honeypot_callback_seconds", "Callback delivery time from enqueue to final outcome", ["outcome"])
+LOOP_LAG_SECONDS = Histogram("honeypot_event_loop_lag_seconds", "How late the event loop ran a timer",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+def price_for(model: str) -> Optional[Tuple[float, ...]]:
+    matches = [name for name in LLM_PRICES if model.startswith(name)]
+    return LLM_PRICES[max(matches, key=len)] if matches else None
+
+
+def _usage_tokens(usage) -> Tuple[int, int, int]:
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    # Part of prompt_tokens served from the provider's prompt cache
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    return prompt, completion, cached
+
+
+def usage_cost(model: str, usage) -> float:
+    """
+    Estimated cost in USD of an OpenAI usage object; 0 for unpriced models.
+    """
+    price = price_for(model)
+    if usage is None or price is None:
+        return 0.0
+    prompt, completion, cached = _usage_tokens(usage)
+    cached_price = price[2] if len(price) > 2 else price[0]
+    return ((prompt - cached) * price[0] + cached * cached_price + completion * price[1]) / 1_000_000
+
+
+def record_llm_usage(model: str, usage) -> float:
+    """
+    Counts tokens from an OpenAI usage object and returns the estimated cost in USD.
+    """
+    if usage is None:
+        return 0.0
+    prompt, completion, cached = _usage_tokens(usage)
+    LLM_TOKENS.inc(prompt, model=model, type="prompt")
+    LLM_TOKENS.inc(completion, model=model, type="completion")
+    LLM_TOKENS.inc(cached, model=model, type="cached")
+    cost = usage_cost(model, usage)
+    if cost:
+        LLM_COST.inc(cost, model=model)
+    return cost
+
+
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("honeypot_trace", default=None)
+
+
+def trace_requested(headers) -> bool:
+    if METRICS_TRACE == "always":
+        return True
+    return METRICS_TRACE != "off" and headers.get(TRACE_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def start_trace():
+    """
+    Starts collecting stage timings for the current request (task context).
+    """
+    _trace.set([])
+
+
+def server_timing() -> str:
+    """
+    Stage timings of the current trace as a Server-Timing header value.
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in _trace.get() or [])
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a block into honeypot_stage_seconds and the request trace, if one is active.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+
+async def monitor_event_loop(interval: float = LOOP_LAG_INTERVAL):
+    """
+    Sleeps in a loop and records how much later than requested each wake-up was.
+    Sustained lag means something is blocking the loop or it is CPU-saturated.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
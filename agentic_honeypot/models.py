@@ -11,10 +11,14 @@ class IncomingMessage(BaseModel):
     message: Optional[Message] = Field(default_factory=lambda: Message(sender="unknown", text="", timestamp=""))
     conversationHistory: Optional[List[Message]] = []
     metadata: Optional[Dict[str, str]] = None
+    # Delta mode: the client sends only `message` plus the historyHash from our last
+    # response, and the server uses its stored history. "" for a new session.
+    historyHash: Optional[str] = None
 
 class AgentResponse(BaseModel):
-    status: str = "success"
+    status: str = "success"  # "resync": historyHash didn't match, resend with full conversationHistory
     reply: str
+    historyHash: Optional[str] = None  # only returned to clients that sent one
 
 class IntelligenceData(BaseModel):
     bankAccounts: List[str] = []
@@ -0,0 +1,167 @@
+import os
+import json
+import string
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Persona definitions, JSON or (with PyYAML installed) YAML. Loaded once per worker;
+# adding a regional persona is a file change, not a code change.
+PERSONAS_PATH = os.getenv("PERSONAS_PATH", os.path.join(os.path.dirname(__file__), "data", "personas.json"))
+PERSONA_DEFAULT = os.getenv("PERSONA_DEFAULT", "")
+PERSONA_RENDER_CACHE = int(os.getenv("PERSONA_RENDER_CACHE", "1024"))
+
+# Session metadata fields personas can be matched on and rendered with
+METADATA_FIELDS = ("language", "locale", "channel")
+METADATA_VALUE_CHARS = 40
+
+
+def _text(value) -> str:
+    """
+    A prompt given as a string or a list of lines, with trailing whitespace and
+    surrounding blank lines removed so the compiled bytes only change with the file.
+    """
+    lines = value if isinstance(value, list) else str(value).splitlines()
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def _fold(value) -> str:
+    return str(value or "").strip().casefold()
+
+
+def normalize_metadata(metadata: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Request metadata reduced to the known fields, with lower-cased keys.
+    """
+    if not metadata:
+        return {}
+    # Values end up in the prompt, so keep them short
+    lowered = {str(k).lower(): str(v).strip()[:METADATA_VALUE_CHARS] for k, v in metadata.items() if v}
+    return {field: lowered[field] for field in METADATA_FIELDS if lowered.get(field)}
+
+
+class Persona:
+    """
+    One compiled persona. prefix is the fixed system prompt and is sent byte-for-byte
+    the same on every call, so the provider's prompt cache can serve it; the context
+    lines that depend on session metadata are rendered after it.
+    """
+    __slots__ = ("id", "name", "match", "prefix", "context", "fields", "fallback_replies")
+
+    def __init__(self, id: str, name: str, prompt, match: Optional[Dict[str, List[str]]] = None,
+                 context: Optional[List[str]] = None, fallback_replies: Optional[List[str]] = None):
+        self.id = id
+        self.name = name or id
+        self.match = {field.lower(): frozenset(_fold(v) for v in (values if isinstance(values, list) else [values]))
+                      for field, values in (match or {}).items()}
+        unknown = set(self.match) - set(METADATA_FIELDS)
+        if unknown:
+            raise ValueError(f"Persona {id!r} matches on unknown metadata fields: {', '.join(sorted(unknown))}")
+        self.prefix = _text(prompt)
+        # Each context line with the metadata fields it needs; a line is only rendered when all are present
+        formatter = string.Formatter()
+        self.context: List[Tuple[str, Tuple[str, ...]]] = []
+        for line in context or []:
+            needs = tuple(name for _, name, _, _ in formatter.parse(line) if name)
+            unknown = set(needs) - set(METADATA_FIELDS)
+            if unknown:
+                raise ValueError(f"Persona {id!r} context uses unknown fields: {', '.join(sorted(unknown))}")
+            self.context.append((line, needs))
+        self.fields = tuple(sorted({name for _, needs in self.context for name in needs}))
+        self.fallback_replies = tuple(fallback_replies or ())
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Persona":
+        return cls(data["id"], data.get("name", ""), data["prompt"], data.get("match"),
+                   data.get("context"), data.get("fallbackReplies"))
+
+    def score(self, metadata: Dict[str, str]) -> int:
+        """
+        Number of match fields the metadata satisfies. A mismatch doesn't disqualify:
+        most clients send a generic locale such as "IN" alongside a specific language.
+        """
+        return sum(1 for field, values in self.match.items() if _fold(metadata.get(field)) in values)
+
+    def render(self, metadata: Dict[str, str]) -> str:
+        lines = [line.format_map(metadata) for line, needs in self.context if all(n in metadata for n in needs)]
+        return self.prefix + "\n\n" + "\n".join(lines) if lines else self.prefix
+
+
+class PersonaRegistry:
+    """
+    Personas by id, selection from session metadata and a memo of rendered system prompts.
+    """
+
+    def __init__(self, personas: List[Persona], default: str = "", cache_size: int = PERSONA_RENDER_CACHE):
+        if not personas:
+            raise ValueError("No personas defined")
+        self.personas: "OrderedDict[str, Persona]" = OrderedDict()
+        for persona in personas:
+            if persona.id in self.personas:
+                raise ValueError(f"Duplicate persona id {persona.id!r}")
+            self.personas[persona.id] = persona
+        if default and default not in self.personas:
+            raise ValueError(f"Default persona {default!r} is not defined")
+        self.default = self.personas[default] if default else personas[0]
+        self.cache_size = cache_size
+        self._rendered: "OrderedDict[Tuple, str]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0}
+
+    @classmethod
+    def load(cls, path: str = PERSONAS_PATH, default: str = PERSONA_DEFAULT) -> "PersonaRegistry":
+        with open(path, encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                # Optional, and only imported for YAML files; JSON persona files work without it
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError(f"PyYAML is required to load {path}") from None
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        return cls([Persona.from_dict(p) for p in data["personas"]], default or data.get("default", ""))
+
+    def get(self, persona_id: Optional[str]) -> Persona:
+        """
+        The persona with this id; the default for unknown or removed ids.
+        """
+        return self.personas.get(persona_id or "", self.default)
+
+    def select(self, metadata: Optional[Dict[str, str]]) -> Persona:
+        """
+        The persona matching the most metadata fields; earlier personas win ties and
+        the default is used when none matches.
+        """
+        metadata = normalize_metadata(metadata)
+        best, best_score = self.default, 0
+        for persona in self.personas.values():
+            score = persona.score(metadata)
+            if score > best_score:
+                best, best_score = persona, score
+        return best
+
+    def system_prompt(self, persona: Persona, metadata: Optional[Dict[str, str]] = None) -> str:
+        """
+        The persona's system prompt for this session, memoized by the metadata values it uses.
+        """
+        metadata = normalize_metadata(metadata)
+        key = (persona.id,) + tuple(metadata.get(field, "") for field in persona.fields)
+        prompt = self._rendered.get(key)
+        if prompt is not None:
+            self.counters["hits"] += 1
+            self._rendered.move_to_end(key)
+            return prompt
+        self.counters["misses"] += 1
+        prompt = self._rendered[key] = persona.render(metadata)
+        while len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+        return prompt
+
+    def fallback_replies(self) -> frozenset:
+        return frozenset(reply for persona in self.personas.values() for reply in persona.fallback_replies)
+
+    def stats(self) -> Dict:
+        return {"personas": list(self.personas), "default": self.default.id, "renderedPrompts": len(self._rendered),
+                **self.counters}
+
+
+personas = PersonaRegistry.load()
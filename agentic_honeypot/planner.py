@@ -0,0 +1,73 @@
+import os
+import asyncio
+from typing import Awaitable, Callable, Optional, Tuple
+
+from .gateway import TokenBucket
+
+# How detection and reply generation are scheduled for a message that still needs a verdict:
+#   speculate   - start the reply alongside an LLM detection; drop it if the verdict is benign
+#   sequential  - wait for the verdict, then generate
+#   cost_capped - speculate only when the local score makes a scam likely, and only while
+#                 speculative replies stay within SPECULATION_TPM tokens per minute
+PLAN_POLICY = os.getenv("PLAN_POLICY", "speculate")
+SPECULATE_MIN_SCORE = float(os.getenv("SPECULATE_MIN_SCORE", "0.5"))
+SPECULATION_TPM = float(os.getenv("SPECULATION_TPM", "20000"))
+# Rough size of one reply call (persona prompt, window, completion), charged against the cap
+SPECULATION_REPLY_TOKENS = int(os.getenv("SPECULATION_REPLY_TOKENS", "600"))
+
+POLICIES = ("speculate", "sequential", "cost_capped")
+
+
+class ExecutionPlanner:
+    """
+    Overlaps reply generation with scam detection when detection has to wait on the
+    LLM. Messages the local scorer or verdict cache settles are never speculated on,
+    since their detection costs no round trip.
+    """
+
+    def __init__(self, detector, policy: str = PLAN_POLICY, min_score: float = SPECULATE_MIN_SCORE,
+                 tokens_per_minute: float = SPECULATION_TPM, reply_tokens: int = SPECULATION_REPLY_TOKENS):
+        if policy not in POLICIES:
+            raise ValueError(f"PLAN_POLICY must be one of {', '.join(POLICIES)}, got {policy!r}")
+        self.detector = detector
+        self.policy = policy
+        self.min_score = min_score
+        self.reply_tokens = reply_tokens
+        self.budget = TokenBucket(tokens_per_minute)
+        self.counters = {"sequential": 0, "speculated": 0, "speculationUsed": 0, "speculationWasted": 0}
+
+    def _should_speculate(self, text: str) -> bool:
+        if self.policy == "sequential" or not self.detector.needs_llm(text):
+            return False
+        if self.policy == "cost_capped":
+            if self.detector.classifier.score(text) < self.min_score:
+                return False
+            return self.budget.try_acquire(self.reply_tokens)
+        return True
+
+    async def detect_and_reply(self, text: str, reply: Optional[Callable[[], Awaitable[str]]] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (is_scam, reply). reply is None when nothing was speculated (or it was
+        discarded); the caller then generates one itself if the message is a scam.
+        """
+        if reply is None or not self._should_speculate(text):
+            self.counters["sequential"] += 1
+            return await self.detector.detect(text), None
+
+        self.counters["speculated"] += 1
+        task = asyncio.create_task(reply())
+        try:
+            is_scam = await self.detector.detect(text)
+        except BaseException:
+            task.cancel()
+            raise
+        if not is_scam:
+            # Cancelling stops the stream of tokens if the request is still in flight
+            task.cancel()
+            self.counters["speculationWasted"] += 1
+            return False, None
+        self.counters["speculationUsed"] += 1
+        # A used speculation cost nothing extra; give its share of the cap back
+        if self.policy == "cost_capped":
+            self.budget.refund(self.reply_tokens)
+        return True, await task
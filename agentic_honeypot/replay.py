@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.completion_usage import CompletionUsage
+
+from .logs import logger
+from .metrics import usage_cost
+
+# Replayed answers sleep for their recorded latency times this factor; 0 runs at CPU speed
+LLM_REPLAY_TIME_SCALE = float(os.getenv("LLM_REPLAY_TIME_SCALE", "0"))
+
+# Request fields that decide the answer. Timeouts, the prompt cache routing key and
+# streaming don't, so a reply recorded as a stream replays for a plain call and vice versa.
+KEY_FIELDS = ("model", "messages", "temperature", "response_format")
+
+
+def prompt_key(request: Dict) -> str:
+    """
+    Hash of the parts of a chat completion request that decide the answer.
+    """
+    canonical = json.dumps({field: request.get(field) for field in KEY_FIELDS},
+                           sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class ReplayMiss(LookupError):
+    """
+    No recorded answer for this prompt. The agent treats it like any failed call:
+    a local fallback reply, no scam verdict from the LLM, no enrichment.
+    """
+
+
+class RecordingClient:
+    """
+    Wraps an AsyncOpenAI client and appends each completed chat completion to a JSONL
+    file: prompt key, model, answer text, token usage and how long the call took.
+    Only chat.completions.create, models and close() are exposed; that is all the agent uses.
+    """
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self.path = path
+        self.models = client.models
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self._lock = threading.Lock()
+        # Line-at-a-time appends, so several workers can record into one file
+        self._file = open(path, "a", encoding="utf-8")
+        self.llm_seconds = 0.0
+        self.cost = 0.0
+        self.counters = {"calls": 0, "recorded": 0}
+
+    async def _create(self, **request):
+        self.counters["calls"] += 1
+        start = time.perf_counter()
+        response = await self._client.chat.completions.create(**request)
+        if request.get("stream"):
+            return self._record_stream(request, response, start)
+        self._write(request, response.model, response.choices[0].message.content, response.usage, start)
+        return response
+
+    async def _record_stream(self, request: Dict, stream, start: float):
+        parts = []
+        model, usage = request.get("model"), None
+        async for chunk in stream:
+            model = chunk.model or model
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        # Streams abandoned part way aren't recorded; there is no complete answer to replay
+        self._write(request, model, "".join(parts), usage, start)
+
+    def _write(self, request: Dict, model: str, content: Optional[str], usage, start: float):
+        seconds = time.perf_counter() - start
+        self.llm_seconds += seconds
+        self.cost += usage_cost(model, usage)
+        line = json.dumps({
+            "key": prompt_key(request),
+            "model": model,
+            "content": content,
+            "usage": usage.model_dump(exclude_none=True) if usage is not None else None,
+            "latency": round(seconds, 4),
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+        self.counters["recorded"] += 1
+
+    def stats(self) -> Dict:
+        return {"path": self.path, **self.counters}
+
+    async def close(self):
+        with self._lock:
+            self._file.close()
+        await self._client.close()
+
+
+class ReplayClient:
+    """
+    Answers chat completions from a recording made by RecordingClient, with no network.
+    Each answer adds its recorded latency to llm_seconds and its usage to cost; it is
+    also slept for time_scale times over, so overlapping calls can be simulated too.
+    """
+
+    def __init__(self, records: Dict[str, Dict], time_scale: float = LLM_REPLAY_TIME_SCALE):
+        self.records = records
+        self.time_scale = time_scale
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.llm_seconds = 0.0
+        self.cost = 0.0
+        self.counters = {"calls": 0, "hits": 0, "misses": 0}
+
+    @classmethod
+    def load(cls, path: str, time_scale: float = LLM_REPLAY_TIME_SCALE) -> "ReplayClient":
+        records: Dict[str, Dict] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    # Sampled replies can be recorded more than once; the first answer wins
+                    records.setdefault(record["key"], record)
+        return cls(records, time_scale)
+
+    async def _create(self, **request):
+        self.counters["calls"] += 1
+        key = prompt_key(request)
+        record = self.records.get(key)
+        if record is None:
+            self.counters["misses"] += 1
+            logger.debug(f"No recorded LLM answer for prompt {key}")
+            raise ReplayMiss(f"No recorded answer for prompt {key}")
+        self.counters["hits"] += 1
+        usage = CompletionUsage.model_validate(record["usage"]) if record.get("usage") else None
+        self.llm_seconds += record["latency"]
+        self.cost += usage_cost(record["model"], usage)
+        # Always yields once, so a speculative reply starts (and is billed) as it would live
+        await asyncio.sleep(record["latency"] * self.time_scale)
+        if request.get("stream"):
+            return self._stream(record, usage)
+        return ChatCompletion(
+            id=f"replay-{key}", object="chat.completion", created=0, model=record["model"], usage=usage,
+            choices=[{"index": 0, "finish_reason": "stop",
+                      "message": {"role": "assistant", "content": record["content"]}}],
+        )
+
+    async def _stream(self, record: Dict, usage: Optional[CompletionUsage]):
+        yield ChatCompletionChunk(
+            id="replay", object="chat.completion.chunk", created=0, model=record["model"],
+            choices=[{"index": 0, "finish_reason": "stop", "delta": {"role": "assistant", "content": record["content"]}}],
+        )
+        yield ChatCompletionChunk(id="replay", object="chat.completion.chunk", created=0,
+                                  model=record["model"], choices=[], usage=usage)
+
+    def stats(self) -> Dict:
+        return {"recordedPrompts": len(self.records), **self.counters}
+
+    async def close(self):
+        pass
@@ -1,101 +1,446 @@
-import requests
-import json
-from typing import Dict, List
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from .models import IncomingMessage, AgentResponse, Message, CallbackPayload, IntelligenceData
-from .agent import HoneyPotAgent
+from .agent import HoneyPotAgent, FALLBACK_REPLIES, warm_up as warm_up_llm
+from .callbacks import CallbackDispatcher
+from .store import create_session_store, SessionRecord
+from .classifier import TieredScamDetector
+from .extractor import IntelExtractor
+from .logs import logger
+from .cache import ResponseCache
+from .metrics import stage, SESSIONS_FLAGGED, HISTORY_SYNC, INTEL_KNOWN
+from .context import load_encoding
+from .history import Turn, EMPTY_HISTORY, extend_state, reconcile, to_turns
+from .planner import ExecutionPlanner
+from .personas import personas
+from .intel_store import create_intel_store, indicator_counts, new_indicators
 
-# In-memory session storage
-# SessionID -> Data dict
-sessions: Dict[str, Dict] = {}
+# Session storage, selected by SESSION_STORE (memory / redis / sqlite)
+sessions = create_session_store()
 
 agent_brain = HoneyPotAgent()
-CALLBACK_URL = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
-MAX_TURNS_BEFORE_CALLBACK = 6 # Heuristic: Report after some exchanges
+# Repeated scam scripts reuse cached verdicts and pooled first-turn replies
+response_cache = ResponseCache()
+# Local scorer first; only uncertain messages reach the LLM detector
+scam_detector = TieredScamDetector(agent_brain, cache=response_cache)
+# Overlaps reply generation with LLM detection according to PLAN_POLICY
+planner = ExecutionPlanner(scam_detector)
+CALLBACK_URL = os.getenv("CALLBACK_URL", "https://hackathon.guvi.in/api/updateHoneyPotFinalResult")
+callback_dispatcher = CallbackDispatcher(CALLBACK_URL)
+# Messages in the conversation before the callback report is sent; tune it offline
+# with benchmarks.replay_eval
+MAX_TURNS_BEFORE_CALLBACK = int(os.getenv("MAX_TURNS_BEFORE_CALLBACK", "6"))
+BENIGN_REPLY = "Thank you for your message. How can I help you today?"
 
-def process_message(data: IncomingMessage) -> AgentResponse:
+intel_extractor = IntelExtractor()
+# Indicators from scam sessions, kept across sessions (INTEL_STORE / INTEL_DB_PATH)
+intel_store = create_intel_store()
+# Intel is extracted locally every turn; the gpt-4o pass only adds to it when enabled,
+# and runs in the background so the reply never waits for it
+INTEL_LLM_ENRICHMENT = os.getenv("INTEL_LLM_ENRICHMENT", "false").lower() == "true"
+_background: set = set()
+
+# /analyze/batch: sessions processed at once, and messages per bulk detection request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_DETECT_SIZE = int(os.getenv("BATCH_DETECT_SIZE", "20"))
+
+class HistoryMismatch(Exception):
+    """
+    A delta request's historyHash doesn't match the stored history.
+    """
+
+    def __init__(self, history_hash: str):
+        super().__init__(history_hash)
+        self.history_hash = history_hash
+
+
+class PendingHistory:
+    """
+    Turns received this request, written to the session history with our reply,
+    and the indicators first extracted from them.
+    """
+    __slots__ = ("turns", "replace", "indicators")
+
+    def __init__(self, turns: List[Turn], replace: bool):
+        self.turns = turns
+        self.replace = replace
+        self.indicators: Dict[str, List[str]] = {}
+
+
+async def _begin_turn(data: IncomingMessage) -> Tuple[SessionRecord, List[Message], PendingHistory, bool]:
+    """
+    Session lookup, history reconciliation and intel update shared by the plain and
+    streaming paths. Detection is left to _settle_detection. The returned flag is
+    True for a new session, whose record isn't stored until the verdict is in.
+    """
     session_id = data.sessionId
     
     # 1. Initialize or Retrieve Session
-    if session_id not in sessions:
-        # New session
-        is_scam = agent_brain.detect_scam(data.message.text)
-        sessions[session_id] = {
-            "history": [],
-            "scamDetected": is_scam,
-            "messageCount": 0,
-            "callbackSent": False
-        }
-        # If passed history is empty, start fresh. If passed history exists (e.g. restart), trust it?
-        # The prompt says 6.1 First Message has empty history.
+    with stage("session_load"):
+        session = await sessions.get(session_id)
+
+    # Delta requests carry no history; they must be based on exactly what we stored
+    delta = data.historyHash is not None and not data.conversationHistory
+    if delta:
+        stored_hash = session.history_hash if session is not None else EMPTY_HISTORY
+        if data.historyHash != stored_hash:
+            HISTORY_SYNC.inc(result="resync")
+            raise HistoryMismatch(stored_hash)
+
+    # The persona is picked from the first message's metadata and kept for the session
+    is_new = session is None
+    if is_new:
+        session = SessionRecord(persona=personas.select(data.metadata).id)
+    elif not session.persona:
+        session.persona = personas.select(data.metadata).id
+
+    # The server keeps its own append-only history. A full conversationHistory is
+    # only hashed against it: if it extends what we stored, just the tail is new; if
+    # it diverged, the client's version replaces ours.
+    if delta:
+        result, tail = "delta", []
     else:
-        # Existing session
-        # If for some reason we missed the start, we stick to previous detection or re-evaluate?
-        # We'll just trust established state.
-        pass
+        result, tail = reconcile(session.history_hash, data.conversationHistory or [])
+    HISTORY_SYNC.inc(result=result)
+    replace = result == "diverged"
+    with stage("history_load"):
+        stored = await sessions.load_history(session_id) if session.history_hash and not replace else []
+    pending = PendingHistory(to_turns(tail) + [Turn.from_message(data.message)], replace)
+    current_history = stored + pending.turns
+
+    # Incremental extraction: only messages new to the server are scanned
+    with stage("intel"):
+        before = indicator_counts(session.intel)
+        for msg in pending.turns:
+            if msg.sender != "user":
+                intel_extractor.update(session.intel, msg.text)
+        pending.indicators = new_indicators(session.intel, before)
 
-    session = sessions[session_id]
-    
-    # Update local history with the incoming history if provided, or just append the new message
-    # The API sends `conversationHistory`. We should probably use that as the source of truth
-    # OR maintain our own. The prompt implies we receive the history.
-    # Let's rely on the incoming `conversationHistory` + the new `message`.
-    
-    current_history = list(data.conversationHistory)  # Copy to avoid mutation
-    current_history.append(data.message)
-    
     # Update our session count
-    session["messageCount"] = len(current_history)
-
-    # 2. Logic
-    if not session["scamDetected"]:
-        # double check if it was not detected initially but now assumes it is?
-        # For this PoC, let's assume detection happens at start. 
-        # But maybe we check every time if not yet detected?
-        is_scam = agent_brain.detect_scam(data.message.text)
-        if is_scam:
-            session["scamDetected"] = True
-
-    if session["scamDetected"]:
+    session.message_count = len(current_history)
+    return session, current_history, pending, is_new
+
+
+async def _known_indicators(session_id: str, pending: PendingHistory) -> Dict[str, Dict[str, List[str]]]:
+    """
+    This turn's new indicators that earlier scam sessions already used.
+    """
+    if not pending.indicators:
+        return {}
+    with stage("intel_lookup"):
+        known = await intel_store.known(session_id, pending.indicators)
+    if known:
+        for kind, values in known.items():
+            INTEL_KNOWN.inc(len(values), type=kind)
+        logger.warning("known scam indicators reused", extra={"fields": {"sessionId": session_id, "known": known}})
+    return known
+
+
+async def _settle_detection(data: IncomingMessage, session: SessionRecord, is_new: bool, is_scam: Optional[bool],
+                            pending: PendingHistory):
+    """
+    Records the verdict (if one was needed), saves the session and queues the
+    indicators of scam sessions for the intel store.
+    """
+    session_id = data.sessionId
+    was_flagged = session.scam_detected and not is_new
+    if is_new:
+        SESSIONS_FLAGGED.inc(verdict="scam" if is_scam else "benign")
+        # create() keeps the existing record if another request/worker got there first
+        with stage("session_create"):
+            stored = await sessions.create(session_id, bool(is_scam), session.persona)
+        session.callback_sent = stored.callback_sent
+        session.persona = stored.persona or session.persona
+        is_scam = is_scam or stored.scam_detected
+    if is_scam:
+        session.scam_detected = True
+
+    with stage("session_save"):
+        await sessions.update(session_id, session.scam_detected, session.message_count, session.intel)
+    if session.scam_detected:
+        # A session flagged just now contributes everything extracted so far
+        intel_store.record(session_id, pending.indicators if was_flagged else new_indicators(session.intel, {}))
+
+
+async def _record_turn(session_id: str, session: SessionRecord, pending: PendingHistory, reply_text: str) -> str:
+    """
+    Appends this turn and our reply to the stored history; returns the new historyHash.
+    """
+    turns = pending.turns + [Turn("user", reply_text, datetime.now(timezone.utc).isoformat())]
+    history_hash = extend_state(EMPTY_HISTORY if pending.replace else session.history_hash, turns)
+    with stage("history_append"):
+        await sessions.append_history(session_id, turns, history_hash, replace=pending.replace)
+    return history_hash
+
+
+async def _finish_turn(session_id: str, session: SessionRecord, current_history: List[Message], reply_text: str):
+    """
+    Queues the callback once the session has exchanged enough messages.
+    """
+    # Check if we should send callback
+    # We send callback if we have exchanged enough messages.
+    # totalMessagesExchanged includes the one we just received + our reply (implied)
+    # mark_callback_sent is a compare-and-set, so only one request across all workers reports a session
+    if (session.message_count >= MAX_TURNS_BEFORE_CALLBACK and not session.callback_sent
+            and await sessions.mark_callback_sent(session_id)):
+        # Extract Intelligence
+        # We include our new reply in the analysis? Maybe.
+        full_history = current_history + [Message(sender="user", text=reply_text, timestamp="now")]
+        if INTEL_LLM_ENRICHMENT:
+            # The gpt-4o pass is off the response path; the callback goes out when it's done
+            task = asyncio.create_task(_report(session_id, session.intel.model_copy(deep=True), full_history, enrich=True))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+        else:
+            await _report(session_id, session.intel, full_history)
+
+
+async def _report(session_id: str, intel: IntelligenceData, full_history: List[Message], enrich: bool = False):
+    """
+    Builds the callback payload and hands it to the dispatcher.
+    """
+    if enrich:
+        before = indicator_counts(intel)
+        intel = intel_extractor.merge(intel, await agent_brain.extract_intelligence(full_history))
+        intel_store.record(session_id, new_indicators(intel, before))
+
+    notes = "Scam detected and engaged. Intelligence extracted."
+    known = await intel_store.known(session_id, new_indicators(intel, {}))
+    if known:
+        reused = "; ".join(f"{value} ({len(ids)}+ sessions)" for values in known.values() for value, ids in values.items())
+        notes += f" Indicators seen in earlier sessions: {reused}."
+
+    # Send Callback
+    payload = CallbackPayload(
+        sessionId=session_id,
+        scamDetected=True,
+        totalMessagesExchanged=len(full_history),
+        extractedIntelligence=intel,
+        agentNotes=notes
+    )
+    logger.info("intelligence extracted", extra={"fields": payload.model_dump()})
+
+    # Spooled and delivered in the background with retries; the reply doesn't wait on it.
+    await callback_dispatcher.enqueue(payload.model_dump())
+
+
+async def drain_background(timeout: float = 10.0):
+    """
+    Waits for in-flight enrichment tasks on shutdown so their callbacks get spooled.
+    """
+    if _background:
+        done, pending = await asyncio.wait(set(_background), timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} intel enrichment task(s) still running at shutdown")
+
+
+async def warm_up():
+    """
+    Startup work that would otherwise land on the first requests: the LLM client and its
+    pooled connections, the local classifier and the tokenizer. Errors are logged, never raised.
+    """
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        warm_up_llm(),
+        asyncio.to_thread(lambda: scam_detector.classifier),
+        asyncio.to_thread(load_encoding),
+        return_exceptions=True,
+    )
+    for error in results:
+        if isinstance(error, Exception):
+            logger.warning(f"Warm-up step failed: {error}")
+    logger.info("Warm-up finished", extra={"fields": {"ms": round((time.perf_counter() - start) * 1000, 1)}})
+
+
+def _pooled_first_reply(current_history: List[Message], persona: str) -> Optional[str]:
+    # Only opening messages share replies; later turns depend on the conversation
+    if len(current_history) != 1:
+        return None
+    return response_cache.first_turn_reply(current_history[0].text, persona)
+
+
+def _remember_first_reply(current_history: List[Message], reply_text: str, persona: str):
+    if len(current_history) == 1 and reply_text and reply_text not in FALLBACK_REPLIES:
+        response_cache.add_first_turn_reply(current_history[0].text, reply_text, persona)
+
+
+async def _reply(data: IncomingMessage, session: SessionRecord, current_history: List[Message]) -> str:
+    """
+    A pooled or freshly generated reply. Not pooled here: this also runs speculatively,
+    before the verdict, and only replies to scams may be served from the pool.
+    """
+    reply_text = _pooled_first_reply(current_history, session.persona)
+    if reply_text is None:
+        reply_text = await agent_brain.generate_reply(current_history, data.sessionId, session.persona, data.metadata)
+    return reply_text
+
+
+async def process_message(data: IncomingMessage) -> AgentResponse:
+    with stage("total"):
+        try:
+            return await _process_message(data)
+        except HistoryMismatch as e:
+            return AgentResponse(status="resync", reply="", historyHash=e.history_hash)
+
+
+def _response(data: IncomingMessage, reply_text: str, history_hash: str) -> AgentResponse:
+    # historyHash only goes back to clients that use delta mode
+    return AgentResponse(status="success", reply=reply_text,
+                         historyHash=history_hash if data.historyHash is not None else None)
+
+
+async def _process_message(data: IncomingMessage) -> AgentResponse:
+    session, current_history, pending, is_new = await _begin_turn(data)
+
+    # Sessions already flagged skip detection, and so do sessions reusing indicators
+    # from earlier scams. Otherwise the planner may start the reply while an LLM
+    # verdict is pending.
+    is_scam, reply_text = None, None
+    known = await _known_indicators(data.sessionId, pending)
+    if known and (is_new or not session.scam_detected):
+        is_scam = True
+    elif is_new or not session.scam_detected:
+        with stage("detect"):
+            is_scam, reply_text = await planner.detect_and_reply(
+                data.message.text, lambda: _reply(data, session, current_history))
+    await _settle_detection(data, session, is_new, is_scam, pending)
+
+    if session.scam_detected:
         # Generate Agent Reply
-        reply_text = agent_brain.generate_reply(current_history)
+        if reply_text is None:
+            with stage("reply"):
+                reply_text = await _reply(data, session, current_history)
+        _remember_first_reply(current_history, reply_text, session.persona)
         
         # Add our reply to history (conceptually, for the NEXT turn)
         # But we just return the reply here.
-        
-        # Check if we should send callback
-        # We send callback if we have exchanged enough messages.
-        # totalMessagesExchanged includes the one we just received + our reply (implied)
-        if session["messageCount"] >= MAX_TURNS_BEFORE_CALLBACK and not session["callbackSent"]:
-            # Extract Intelligence
-            # We include our new reply in the analysis? Maybe.
-            full_history = current_history + [Message(sender="user", text=reply_text, timestamp="now")]
-            intel = agent_brain.extract_intelligence(full_history)
-            
-            # Send Callback
-            payload = CallbackPayload(
-                sessionId=session_id,
-                scamDetected=True,
-                totalMessagesExchanged=len(full_history),
-                extractedIntelligence=intel,
-                agentNotes="Scam detected and engaged. Intelligence extracted."
-            )
-            print("\n==============================================")
-            print("🔍 EXTRACTED INTELLIGENCE (READY TO SEND):")
-            print(json.dumps(payload.model_dump(), indent=2))
-            print("==============================================\n")
-
-            try:
-                # Fire and forget? Or wait? Pydantic model to dict
-                requests.post(CALLBACK_URL, json=payload.model_dump(), timeout=5)
-                # We interpret strict "Mandatory" as "Try to send".
-            except Exception as e:
-                print(f"Failed to send callback: {e}")
-            
-            # Mark callback as sent
-            session["callbackSent"] = True
-
-        return AgentResponse(status="success", reply=reply_text)
+        history_hash = await _record_turn(data.sessionId, session, pending, reply_text)
+        with stage("callback"):
+            await _finish_turn(data.sessionId, session, current_history, reply_text)
+
+        return _response(data, reply_text, history_hash)
     else:
         # Not a scam, return generic or empty?
         # The prompt implies we engage scammers.
-        return AgentResponse(status="success", reply="Thank you for your message. How can I help you today?")
+        history_hash = await _record_turn(data.sessionId, session, pending, BENIGN_REPLY)
+        return _response(data, BENIGN_REPLY, history_hash)
+
+
+async def stream_message(data: IncomingMessage) -> AsyncIterator[Union[str, AgentResponse]]:
+    """
+    Streaming variant of process_message: yields reply text chunks as they arrive,
+    then the complete AgentResponse last.
+    """
+    try:
+        session, current_history, pending, is_new = await _begin_turn(data)
+    except HistoryMismatch as e:
+        yield AgentResponse(status="resync", reply="", historyHash=e.history_hash)
+        return
+
+    # The reply is streamed, so there's nothing to speculate with: detect first
+    is_scam = None
+    known = await _known_indicators(data.sessionId, pending)
+    if known and (is_new or not session.scam_detected):
+        is_scam = True
+    elif is_new or not session.scam_detected:
+        with stage("detect"):
+            is_scam, _ = await planner.detect_and_reply(data.message.text)
+    await _settle_detection(data, session, is_new, is_scam, pending)
+
+    if not session.scam_detected:
+        history_hash = await _record_turn(data.sessionId, session, pending, BENIGN_REPLY)
+        yield BENIGN_REPLY
+        yield _response(data, BENIGN_REPLY, history_hash)
+        return
+
+    reply_text = _pooled_first_reply(current_history, session.persona)
+    if reply_text is not None:
+        yield reply_text
+    else:
+        chunks = []
+        async for chunk in agent_brain.stream_reply(current_history, data.sessionId, session.persona, data.metadata):
+            chunks.append(chunk)
+            yield chunk
+        reply_text = "".join(chunks).strip()
+        _remember_first_reply(current_history, reply_text, session.persona)
+    history_hash = await _record_turn(data.sessionId, session, pending, reply_text)
+    with stage("callback"):
+        await _finish_turn(data.sessionId, session, current_history, reply_text)
+    yield _response(data, reply_text, history_hash)
+
+
+async def detect_bulk(messages: List[IncomingMessage]):
+    """
+    Pre-classifies a batch. Messages the local scorer can't decide (and that aren't
+    cached yet) go to the LLM BATCH_DETECT_SIZE at a time; the verdicts land in the
+    response cache, so the per-message pass below finds them without another call.
+    """
+    flagged: Dict[str, bool] = {}
+    pending: List[str] = []
+    seen = set()
+    for data in messages:
+        if data.sessionId not in flagged:
+            record = await sessions.get(data.sessionId)
+            flagged[data.sessionId] = bool(record and record.scam_detected)
+        # "message": null is valid JSON for the model; that item errors on its own later
+        text = data.message.text if data.message is not None else None
+        # Sessions already flagged skip detection entirely
+        if flagged[data.sessionId] or not text or text in seen:
+            continue
+        seen.add(text)
+        if scam_detector.is_uncertain(text) and not response_cache.has_verdict(text):
+            pending.append(text)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def detect_chunk(chunk: List[str]):
+        async with semaphore:
+            verdicts = await agent_brain.detect_scam_batch(chunk)
+        # On failure nothing is cached and those messages get the usual single-message path
+        for text, verdict in zip(chunk, verdicts or []):
+            response_cache.put_verdict(text, verdict)
+
+    await asyncio.gather(*(detect_chunk(pending[i:i + BATCH_DETECT_SIZE])
+                           for i in range(0, len(pending), BATCH_DETECT_SIZE)))
+
+
+async def process_batch(messages: List[IncomingMessage], concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Tuple[int, AgentResponse]]:
+    """
+    Runs a batch through process_message and yields (index, response) in input order.
+    Messages of one session are processed in order; distinct sessions run concurrently.
+    """
+    try:
+        await detect_bulk(messages)
+    except Exception as e:
+        # Pre-classification only saves LLM calls; each message still gets detected on its own
+        logger.error(f"Batch pre-classification failed: {e}")
+
+    by_session: Dict[str, List[int]] = {}
+    for index, data in enumerate(messages):
+        by_session.setdefault(data.sessionId, []).append(index)
+
+    loop = asyncio.get_running_loop()
+    results = [loop.create_future() for _ in messages]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_session(indexes: List[int]):
+        async with semaphore:
+            for index in indexes:
+                try:
+                    response = await process_message(messages[index])
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {e}")
+                    response = AgentResponse(status="success", reply=BENIGN_REPLY)
+                results[index].set_result(response)
+
+    tasks = [asyncio.create_task(run_session(indexes)) for indexes in by_session.values()]
+    try:
+        for index, result in enumerate(results):
+            yield index, await result
+    finally:
+        # Client went away mid-stream: don't keep working on its batch
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,30 @@
+from collections import deque
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyWindow:
+    """
+    Keeps the most recent samples (seconds) and summarises them in milliseconds.
+    """
+
+    def __init__(self, size: int = 1000):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        values = list(self.samples)
+        return {
+            "p50": round(percentile(values, 50) * 1000, 1),
+            "p95": round(percentile(values, 95) * 1000, 1),
+            "max": round(max(values, default=0.0) * 1000, 1),
+        }
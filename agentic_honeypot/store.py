@@ -0,0 +1,457 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional
+
+from .models import IntelligenceData
+from .history import Turn, EMPTY_HISTORY
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(6 * 60 * 60)))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "100000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+
+class SessionRecord:
+    """
+    Per-session state. Slotted so a large in-memory store stays compact.
+    history_hash is the rolling-hash state of the stored history (see history.py);
+    history holds the turns themselves for the in-memory store only. persona is the
+    id of the persona chosen when the session started ("" for older sessions).
+    """
+    __slots__ = ("scam_detected", "message_count", "callback_sent", "updated_at", "intel", "history_hash", "history",
+                 "persona")
+
+    def __init__(self, scam_detected: bool = False, message_count: int = 0, callback_sent: bool = False,
+                 updated_at: float = 0.0, intel: Optional[IntelligenceData] = None, history_hash: str = EMPTY_HISTORY,
+                 persona: str = ""):
+        self.scam_detected = scam_detected
+        self.message_count = message_count
+        self.callback_sent = callback_sent
+        self.updated_at = updated_at or time.time()
+        self.intel = intel if intel is not None else IntelligenceData()
+        self.history_hash = history_hash
+        self.history: Optional[List[Turn]] = None
+        self.persona = persona
+
+    def __repr__(self):
+        return (f"SessionRecord(scam_detected={self.scam_detected}, message_count={self.message_count}, "
+                f"callback_sent={self.callback_sent})")
+
+
+class SessionStore(ABC):
+    """
+    Interface for session state shared by process_message.
+
+    create() never overwrites an existing session, and mark_callback_sent() is a
+    compare-and-set: exactly one caller per session gets True, even across workers.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[SessionRecord]:
+        """
+        The session, or None if it doesn't exist or has expired.
+        """
+
+    @abstractmethod
+    async def create(self, session_id: str, scam_detected: bool, persona: str = "") -> SessionRecord:
+        """
+        Creates the session if absent and returns the stored record either way.
+        """
+
+    @abstractmethod
+    async def update(self, session_id: str, scam_detected: bool, message_count: int, intel: Optional[IntelligenceData] = None):
+        """
+        Writes the mutable fields back. intel is left untouched when None.
+        """
+
+    @abstractmethod
+    async def mark_callback_sent(self, session_id: str) -> bool:
+        """
+        Atomically flips callbackSent from False to True. Returns True only for the caller that flipped it.
+        """
+
+    @abstractmethod
+    async def load_history(self, session_id: str) -> List[Turn]:
+        """
+        The stored turns, oldest first.
+        """
+
+    @abstractmethod
+    async def append_history(self, session_id: str, turns: List[Turn], history_hash: str, replace: bool = False):
+        """
+        Appends turns to the session's history (or replaces it, when the client's
+        history diverged) and records the resulting rolling-hash state.
+        """
+
+    @abstractmethod
+    async def size(self) -> int:
+        """
+        Number of live sessions.
+        """
+
+    async def start(self):
+        """
+        Opens connections and files up front; stores also open them on first use.
+        """
+
+    async def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-process store bounded by max_size (least recently used evicted first) and by TTL since last use.
+    """
+
+    def __init__(self, max_size: int = SESSION_MAX, ttl: float = SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+
+    def _evict(self, now: float):
+        # Records are kept in last-use order, so expired ones are always at the front
+        while self._records:
+            oldest = next(iter(self._records.values()))
+            if len(self._records) > self.max_size or now - oldest.updated_at > self.ttl:
+                self._records.popitem(last=False)
+            else:
+                break
+
+    def _touch(self, session_id: str, now: float) -> Optional[SessionRecord]:
+        record = self._records.get(session_id)
+        if record is None:
+            return None
+        if now - record.updated_at > self.ttl:
+            del self._records[session_id]
+            return None
+        record.updated_at = now
+        self._records.move_to_end(session_id)
+        return record
+
+    async def get(self, session_id: str) -> Optional[SessionRecord]:
+        return self._touch(session_id, time.time())
+
+    async def create(self, session_id: str, scam_detected: bool, persona: str = "") -> SessionRecord:
+        now = time.time()
+        record = self._touch(session_id, now)
+        if record is None:
+            record = SessionRecord(scam_detected=scam_detected, updated_at=now, persona=persona)
+            self._records[session_id] = record
+            self._evict(now)
+        return record
+
+    async def update(self, session_id: str, scam_detected: bool, message_count: int, intel: Optional[IntelligenceData] = None):
+        record = await self.create(session_id, scam_detected)
+        record.scam_detected = scam_detected
+        record.message_count = message_count
+        if intel is not None:
+            record.intel = intel
+
+    async def mark_callback_sent(self, session_id: str) -> bool:
+        record = await self.create(session_id, True)
+        if record.callback_sent:
+            return False
+        record.callback_sent = True
+        return True
+
+    async def load_history(self, session_id: str) -> List[Turn]:
+        record = self._touch(session_id, time.time())
+        return list(record.history or []) if record is not None else []
+
+    async def append_history(self, session_id: str, turns: List[Turn], history_hash: str, replace: bool = False):
+        record = await self.create(session_id, False)
+        if replace or record.history is None:
+            record.history = []
+        record.history.extend(turns)
+        record.history_hash = history_hash
+
+    async def size(self) -> int:
+        self._evict(time.time())
+        return len(self._records)
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Shared store for multi-worker deployments. Works with any Redis-protocol server,
+    or pass client=fakeredis.aioredis.FakeRedis() for local testing.
+
+    Session fields live in a hash, callbackSent included: HSETNX makes it a
+    compare-and-set with no Lua scripting, and it shares the hash's expiry, which every
+    write refreshes. History is a list of JSON triples.
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = SESSION_TTL, client=None, prefix: str = "honeypot:session:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("SESSION_STORE=redis requires the 'redis' package") from e
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    def _callback_key(self, session_id: str) -> str:
+        # callbackSent used to be this separate key; still read so flags set before stay honoured
+        return self.prefix + session_id + ":callback"
+
+    def _history_key(self, session_id: str) -> str:
+        return self.prefix + session_id + ":history"
+
+    async def get(self, session_id: str) -> Optional[SessionRecord]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self._key(session_id))
+            pipe.exists(self._callback_key(session_id))
+            fields, legacy_callback = await pipe.execute()
+        if not fields:
+            return None
+        fields = {(k.decode() if isinstance(k, bytes) else k): v for k, v in fields.items()}
+        intel = fields.get("intel")
+        history_hash = fields.get("hhash", b"")
+        persona = fields.get("persona", b"")
+        return SessionRecord(
+            scam_detected=int(fields.get("scam", 0)) == 1,
+            message_count=int(fields.get("count", 0)),
+            callback_sent="callback" in fields or bool(legacy_callback),
+            intel=IntelligenceData.model_validate_json(intel) if intel else None,
+            history_hash=history_hash.decode() if isinstance(history_hash, bytes) else history_hash,
+            persona=persona.decode() if isinstance(persona, bytes) else persona,
+        )
+
+    async def create(self, session_id: str, scam_detected: bool, persona: str = "") -> SessionRecord:
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(key, "scam", int(scam_detected))
+            pipe.hsetnx(key, "count", 0)
+            pipe.hsetnx(key, "persona", persona)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        return await self.get(session_id)
+
+    async def update(self, session_id: str, scam_detected: bool, message_count: int, intel: Optional[IntelligenceData] = None):
+        key = self._key(session_id)
+        fields = {"scam": int(scam_detected), "count": message_count}
+        if intel is not None:
+            fields["intel"] = intel.model_dump_json()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def mark_callback_sent(self, session_id: str) -> bool:
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(key, "callback", 1)
+            # Flags set before callbackSent moved into the hash
+            pipe.exists(self._callback_key(session_id))
+            pipe.expire(key, self.ttl)
+            flipped, legacy_callback, _ = await pipe.execute()
+        return bool(flipped) and not legacy_callback
+
+    async def load_history(self, session_id: str) -> List[Turn]:
+        return [Turn(*json.loads(item)) for item in await self.client.lrange(self._history_key(session_id), 0, -1)]
+
+    async def append_history(self, session_id: str, turns: List[Turn], history_hash: str, replace: bool = False):
+        key = self._history_key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            if replace:
+                pipe.delete(key)
+            if turns:
+                pipe.rpush(key, *(json.dumps(list(t), ensure_ascii=False) for t in turns))
+            pipe.hset(self._key(session_id), "hhash", history_hash)
+            pipe.expire(key, self.ttl)
+            pipe.expire(self._key(session_id), self.ttl)
+            await pipe.execute()
+
+    async def size(self) -> int:
+        count = 0
+        async for key in self.client.scan_iter(match=self.prefix + "*", count=1000):
+            if not (key.decode() if isinstance(key, bytes) else key).endswith((":callback", ":history")):
+                count += 1
+        return count
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store shared by workers on one host through a WAL-mode SQLite file.
+    Queries run on a thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Opened by start() or the first query, so importing the service creates no files
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self):
+        if self._conn is not None:
+            return
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " scam_detected INTEGER NOT NULL,"
+            " message_count INTEGER NOT NULL DEFAULT 0,"
+            " callback_sent INTEGER NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL,"
+            " intel TEXT)"
+        )
+        # Databases created before these columns existed
+        for column in ("intel TEXT", "history_hash TEXT NOT NULL DEFAULT ''", "persona TEXT NOT NULL DEFAULT ''"):
+            try:
+                conn.execute(f"ALTER TABLE sessions ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_history ("
+            " session_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " sender TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " ts TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+        self._conn = conn
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                self._connect()
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    def _get(self, session_id: str) -> Optional[SessionRecord]:
+        row = self._conn.execute(
+            "SELECT scam_detected, message_count, callback_sent, updated_at, intel, history_hash, persona"
+            " FROM sessions WHERE id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        intel = IntelligenceData.model_validate_json(row[4]) if row[4] else None
+        return SessionRecord(bool(row[0]), row[1], bool(row[2]), row[3], intel, row[5], row[6])
+
+    def _create(self, session_id: str, scam_detected: bool, persona: str) -> SessionRecord:
+        now = time.time()
+        # An expired row counts as absent, so replace it rather than keep stale state
+        if self._conn.execute("DELETE FROM sessions WHERE id = ? AND updated_at <= ?", (session_id, now - self.ttl)).rowcount:
+            self._conn.execute("DELETE FROM session_history WHERE session_id = ?", (session_id,))
+        self._conn.execute(
+            "INSERT OR IGNORE INTO sessions (id, scam_detected, updated_at, persona) VALUES (?, ?, ?, ?)",
+            (session_id, int(scam_detected), now, persona),
+        )
+        self._maybe_purge(now)
+        return self._get(session_id)
+
+    def _update(self, session_id: str, scam_detected: bool, message_count: int, intel: Optional[IntelligenceData]):
+        self._conn.execute(
+            "UPDATE sessions SET scam_detected = ?, message_count = ?, updated_at = ?, intel = COALESCE(?, intel) WHERE id = ?",
+            (int(scam_detected), message_count, time.time(), intel.model_dump_json() if intel is not None else None, session_id),
+        )
+
+    def _mark_callback_sent(self, session_id: str) -> bool:
+        cursor = self._conn.execute(
+            "UPDATE sessions SET callback_sent = 1, updated_at = ? WHERE id = ? AND callback_sent = 0",
+            (time.time(), session_id),
+        )
+        return cursor.rowcount == 1
+
+    def _load_history(self, session_id: str) -> List[Turn]:
+        rows = self._conn.execute(
+            "SELECT sender, text, ts FROM session_history WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        return [Turn(*row) for row in rows]
+
+    def _append_history(self, session_id: str, turns: List[Turn], history_hash: str, replace: bool):
+        # The connection is in autocommit mode; group the writes explicitly
+        self._conn.execute("BEGIN")
+        try:
+            if replace:
+                self._conn.execute("DELETE FROM session_history WHERE session_id = ?", (session_id,))
+            start = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM session_history WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO session_history (session_id, seq, sender, text, ts) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, start + i, *turn) for i, turn in enumerate(turns)],
+            )
+            self._conn.execute(
+                "UPDATE sessions SET history_hash = ?, updated_at = ? WHERE id = ?",
+                (history_hash, time.time(), session_id),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _maybe_purge(self, now: float):
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl,))
+            self._conn.execute("DELETE FROM session_history WHERE session_id NOT IN (SELECT id FROM sessions)")
+
+    async def get(self, session_id: str) -> Optional[SessionRecord]:
+        return await self._run(self._get, session_id)
+
+    async def create(self, session_id: str, scam_detected: bool, persona: str = "") -> SessionRecord:
+        return await self._run(self._create, session_id, scam_detected, persona)
+
+    async def update(self, session_id: str, scam_detected: bool, message_count: int, intel: Optional[IntelligenceData] = None):
+        await self._run(self._update, session_id, scam_detected, message_count, intel)
+
+    async def mark_callback_sent(self, session_id: str) -> bool:
+        return await self._run(self._mark_callback_sent, session_id)
+
+    async def load_history(self, session_id: str) -> List[Turn]:
+        return await self._run(self._load_history, session_id)
+
+    async def append_history(self, session_id: str, turns: List[Turn], history_hash: str, replace: bool = False):
+        await self._run(self._append_history, session_id, turns, history_hash, replace)
+
+    async def size(self) -> int:
+        row = await self._run(lambda: self._conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE updated_at > ?", (time.time() - self.ttl,)
+        ).fetchone())
+        return row[0]
+
+    async def start(self):
+        await self._run(lambda: None)
+
+    async def close(self):
+        def close():
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+        await asyncio.to_thread(close)
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """
+    Builds the store selected by SESSION_STORE (memory, redis or sqlite).
+    """
+    if kind == "redis":
+        return RedisSessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {kind}")
@@ -0,0 +1,76 @@
+"""
+Shows that concurrent sessions no longer serialize on the LLM calls.
+
+Starts the fake OpenAI server, then runs N first-turn sessions through
+process_message one after another and all at once. With the async pipeline the
+concurrent run should take about as long as a single session, not N times.
+
+Every session opens with a different message and detection is sent to the LLM, so
+the verdict cache, the first-turn reply pool and the local scorer can't stand in
+for the LLM calls being measured.
+
+    python -m benchmarks.async_concurrency --sessions 20 --latency 0.3
+"""
+import os
+import time
+import asyncio
+import argparse
+
+
+async def run_sessions(process_message, IncomingMessage, n: int, concurrent: bool, tag: str) -> float:
+    payloads = [
+        IncomingMessage(
+            sessionId=f"{tag}-{i}",
+            message={"sender": "scammer", "timestamp": "now",
+                     "text": f"Your account ending {tag}-{i} will be blocked today. Verify immediately."},
+            conversationHistory=[],
+        )
+        for i in range(n)
+    ]
+    start = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(process_message(p) for p in payloads))
+    else:
+        for p in payloads:
+            await process_message(p)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    # Every opening message goes to the LLM detector; no near-duplicate cache hits
+    os.environ["SCAM_THRESHOLD"] = "1.01"
+    os.environ["BENIGN_THRESHOLD"] = "-0.01"
+    os.environ["CACHE_NEAR_DUPLICATES"] = "false"
+    os.environ.setdefault("INTEL_STORE", "off")
+
+    from benchmarks.fake_openai_server import serve_in_thread
+    from agentic_honeypot.models import IncomingMessage
+    from agentic_honeypot.service import process_message
+
+    serve_in_thread(args.port)
+
+    async def bench():
+        # Client construction, classifier training and connection setup aren't the subject here
+        await run_sessions(process_message, IncomingMessage, 1, False, "warmup")
+        single = await run_sessions(process_message, IncomingMessage, 1, False, "single")
+        serial = await run_sessions(process_message, IncomingMessage, args.sessions, False, "serial")
+        together = await run_sessions(process_message, IncomingMessage, args.sessions, True, "concurrent")
+        return single, serial, together
+
+    single, serial, together = asyncio.run(bench())
+    print(f"1 session:                 {single:.2f}s")
+    print(f"{args.sessions} sessions sequential:   {serial:.2f}s ({serial / single:.1f}x)")
+    print(f"{args.sessions} sessions concurrent:   {together:.2f}s ({together / single:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Cold-start budget for a fresh worker.
+
+Two measurements, each the best of --runs fresh processes:
+
+- import: `import agentic_honeypot.main` in a new interpreter, and whether it pulled
+  in the OpenAI SDK (it shouldn't; the client is built by the startup warm-up);
+- cold start: from spawning uvicorn to the answer to its first POST / (an opening
+  scam message), split into the wait for GET / to return 200 and the first POST /
+  itself. LLM calls go to the local fake server, so only the service's own startup
+  is measured.
+
+Exits 1 when a measurement is over its budget, so it can gate CI.
+
+    python -m benchmarks.cold_start --import-budget 1.0 --cold-start-budget 3.0
+    python -m benchmarks.cold_start --warm-up background   # compare WARM_UP modes
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = "cold-start-key"
+OPENING_MESSAGE = "URGENT: Your SBI account will be blocked today. Verify KYC at http://sbi-kyc.example/verify now."
+
+IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import agentic_honeypot.main\n"
+    "print(json.dumps({'seconds': time.perf_counter() - start, 'openai': 'openai' in sys.modules}))\n"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def service_env(workdir: str, llm_port: int, warm_up: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "fake-key"),
+        "HONEYPOT_API_KEY": API_KEY,
+        "CALLBACK_URL": "http://127.0.0.1:9/unused",
+        "CALLBACK_SPOOL_DIR": os.path.join(workdir, "spool"),
+        "INTEL_DB_PATH": os.path.join(workdir, "intel.db"),
+        "LOG_LEVEL": "WARNING",
+        "WARM_UP": warm_up,
+    })
+    return env
+
+
+def measure_import(env: Dict[str, str], workdir: str) -> Dict:
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, cwd=workdir,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def request(url: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+    req = urllib.request.Request(url, data=body, headers={"x-api-key": API_KEY, "Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.status, response.read()
+
+
+def measure_cold_start(env: Dict[str, str], workdir: str, timeout: float) -> Dict:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "agentic_honeypot.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode} before serving")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"No response from GET / within {timeout}s")
+            try:
+                status, _ = request(base + "/")
+                if status == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        ready = time.perf_counter() - start
+        body = json.dumps({"sessionId": "cold-start", "message": {"sender": "scammer", "text": OPENING_MESSAGE}}).encode()
+        analyze_start = time.perf_counter()
+        status, _ = request(base + "/", body)
+        first_analyze = time.perf_counter() - analyze_start
+        if status != 200:
+            raise RuntimeError(f"POST / returned {status}")
+        return {"coldStart": time.perf_counter() - start, "ready": ready, "firstAnalyze": first_analyze}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget", type=float, default=1.0, help="seconds to import agentic_honeypot.main")
+    parser.add_argument("--cold-start-budget", type=float, default=3.0,
+                        help="seconds from spawning uvicorn to the answer to the first POST /")
+    parser.add_argument("--warm-up", default="startup", choices=("startup", "background", "off"))
+    parser.add_argument("--fake-port", type=int, default=8100)
+    args = parser.parse_args(argv)
+
+    from benchmarks import fake_openai_server
+    fake_openai_server.LATENCY = 0.05
+    fake_openai_server.serve_in_thread(args.fake_port)
+
+    workdir = tempfile.mkdtemp(prefix="cold-start-")
+    env = service_env(workdir, args.fake_port, args.warm_up)
+    imports = [measure_import(env, workdir) for _ in range(args.runs)]
+    starts = [measure_cold_start(env, workdir, timeout=args.cold_start_budget * 5) for _ in range(args.runs)]
+    best = min(starts, key=lambda r: r["coldStart"])
+
+    failed = False
+    for name, seconds, budget in (("import", min(r["seconds"] for r in imports), args.import_budget),
+                                  ("cold start", best["coldStart"], args.cold_start_budget)):
+        over = seconds > budget
+        failed |= over
+        print(f"{name:<11} {seconds * 1000:8.1f}ms  budget {budget * 1000:.0f}ms  {'OVER' if over else 'ok'}")
+    print(f"  GET / ready after {best['ready'] * 1000:.1f}ms, first POST / took {best['firstAnalyze'] * 1000:.1f}ms "
+          f"(WARM_UP={args.warm_up})")
+    if any(r["openai"] for r in imports):
+        print("openai SDK was imported at module load; it should be deferred to warm-up")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Prompt tokens per generate_reply turn, full history vs the windowed context.
+
+Builds synthetic scammer sessions of 5, 50 and 200 messages and counts the
+prompt tokens each turn would send. The count uses the same local estimate as
+the context manager. Also times how long building the prompt takes.
+
+    python -m benchmarks.context_benchmark
+"""
+import time
+import argparse
+
+from agentic_honeypot.models import Message
+from agentic_honeypot.context import ContextManager, message_tokens
+from agentic_honeypot.personas import personas
+
+SCRIPT = [
+    "Sir aapka SBI account block ho gaya hai, KYC update karna padega",
+    "Haan sahab, kya karna hoga? Mujhe samajh nahi aaya",
+    "Is link pe click karo http://sbi-kyc-update.in aur details bharo",
+    "Link khul nahi raha sahab, aap hi bata do kya bharna hai",
+    "Apna account number aur OTP batao, main update kar deta hu. Call 9876543210",
+    "Account number mere bete ke paas hai, aapka UPI ID kya hai?",
+]
+
+
+def build_history(length: int):
+    history = []
+    for i in range(length):
+        text = SCRIPT[i % len(SCRIPT)]
+        history.append(Message(sender="scammer" if i % 2 == 0 else "user", text=f"{text} ({i})", timestamp=""))
+    return history
+
+
+def full_prompt_tokens(system_prompt: str, history) -> int:
+    return message_tokens({"content": system_prompt}) + sum(message_tokens({"content": m.text}) for m in history)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", default="5,50,200")
+    args = parser.parse_args()
+
+    system_prompt = personas.system_prompt(personas.default)
+    print(f"{'messages':>8} | {'full (last turn)':>16} | {'windowed (last turn)':>20} | {'full total':>10} | {'windowed total':>14} | {'build us/turn':>13}")
+    for length in (int(n) for n in args.lengths.split(",")):
+        history = build_history(length)
+        context = ContextManager()
+        full_total = windowed_total = 0
+        build_time = 0.0
+        last_full = last_windowed = 0
+        # Replay the session turn by turn, as the service would see it
+        for turn in range(1, length + 1, 2):
+            prefix = history[:turn]
+            last_full = full_prompt_tokens(system_prompt, prefix)
+            start = time.perf_counter()
+            messages = context.build_messages(system_prompt, prefix, session_id=f"bench-{length}")
+            build_time += time.perf_counter() - start
+            last_windowed = sum(message_tokens(m) for m in messages)
+            full_total += last_full
+            windowed_total += last_windowed
+        turns = (length + 1) // 2
+        print(f"{length:>8} | {last_full:>16} | {last_windowed:>20} | {full_total:>10} | {windowed_total:>14} | {build_time / turns * 1e6:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
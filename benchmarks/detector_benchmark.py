@@ -0,0 +1,81 @@
+"""
+Measures how many gpt-4o detection calls the local scorer avoids.
+
+Runs every message in a labeled JSONL corpus through TieredScamDetector. The LLM
+tier is simulated: it answers with the true label after --llm-latency seconds.
+The script reports LLM calls avoided, accuracy of the local decisions and the
+latency saved.
+
+    python -m benchmarks.detector_benchmark --llm-latency 0.8
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+from agentic_honeypot.classifier import TieredScamDetector, ScamClassifier, SCAM_THRESHOLD, BENIGN_THRESHOLD
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "labeled_messages.jsonl")
+
+
+class OracleLLM:
+    """
+    Stands in for HoneyPotAgent.detect_scam: returns the label after a fixed delay.
+    """
+
+    def __init__(self, labels, latency: float):
+        self.labels = labels
+        self.latency = latency
+        self.calls = 0
+
+    async def detect_scam(self, text: str) -> bool:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return bool(self.labels[text])
+
+
+async def run(corpus: str, llm_latency: float, scam_threshold: float, benign_threshold: float):
+    with open(corpus, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    labels = {row["text"]: row["label"] for row in rows}
+
+    llm = OracleLLM(labels, llm_latency)
+    detector = TieredScamDetector(llm, ScamClassifier.from_corpus(), scam_threshold, benign_threshold)
+
+    local_correct = local_total = 0
+    elapsed = 0.0
+    for row in rows:
+        start = time.perf_counter()
+        local = detector.classify_locally(row["text"])
+        if local is None:
+            detector.counters["escalated"] += 1
+            await llm.detect_scam(row["text"])
+        else:
+            local_total += 1
+            local_correct += int(local == bool(row["label"]))
+        elapsed += time.perf_counter() - start
+
+    total = len(rows)
+    baseline = total * llm_latency
+    print(f"messages:            {total}")
+    print(f"thresholds:          benign <= {benign_threshold}, scam >= {scam_threshold}")
+    print(f"decided locally:     {local_total} ({local_total / total:.0%}), "
+          f"{detector.counters['localScam']} scam / {detector.counters['localBenign']} benign")
+    print(f"local accuracy:      {local_correct}/{local_total}")
+    print(f"LLM calls:           {llm.calls} (avoided {total - llm.calls})")
+    print(f"detection latency:   {elapsed:.2f}s vs {baseline:.2f}s all-LLM (saved {baseline - elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--scam-threshold", type=float, default=SCAM_THRESHOLD)
+    parser.add_argument("--benign-threshold", type=float, default=BENIGN_THRESHOLD)
+    args = parser.parse_args()
+    asyncio.run(run(args.corpus, args.llm_latency, args.scam_threshold, args.benign_threshold))
+
+
+if __name__ == "__main__":
+    main()
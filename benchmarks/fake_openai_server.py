@@ -0,0 +1,155 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Sleeps for a configurable latency and returns canned answers shaped like the
+real API, so the honeypot can be exercised without network or API spend.
+FAKE_LLM_ERROR_RATE injects failures (FAKE_LLM_ERROR_STATUS, default 500) from a
+seeded RNG, so runs are reproducible. FAKE_LLM_MAX_CONCURRENCY emulates a provider
+quota: requests beyond that many in flight get a 429 with a retry-after header.
+
+Run standalone:
+    FAKE_LLM_LATENCY=0.5 uvicorn benchmarks.fake_openai_server:app --port 8100
+and point the service at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+"""
+import os
+import time
+import json
+import random
+import asyncio
+import threading
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake OpenAI")
+
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_LLM_ERROR_STATUS", "500"))
+MAX_CONCURRENCY = int(os.getenv("FAKE_LLM_MAX_CONCURRENCY", "0"))  # 0 = unlimited
+
+_rng = random.Random(int(os.getenv("FAKE_LLM_SEED", "0")))
+
+# Simple counters so benchmarks can report LLM calls per turn
+stats = {"calls": 0, "errors": 0, "throttled": 0, "callbacks": 0}
+_in_flight = 0
+
+
+def _canned_content(body: Dict[str, Any]) -> str:
+    messages = body.get("messages") or []
+    system = messages[0].get("content", "") if messages else ""
+    if "numbered message" in system:
+        count = sum(1 for line in messages[-1].get("content", "").splitlines() if line.strip())
+        return json.dumps({"results": [True] * count})
+    if "scam detection" in system:
+        return "TRUE"
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps({
+            "bankAccounts": ["123456789012"],
+            "upiIds": ["fraud@ybl"],
+            "phishingLinks": ["http://fake-bank.example/kyc"],
+            "phoneNumbers": ["+919876543210"],
+            "suspiciousKeywords": ["urgent", "blocked"]
+        })
+    return "Haan sahab, samajh nahi aaya. Aapka UPI ID kya hai?"
+
+
+@app.get("/v1/models")
+async def list_models():
+    # Hit by the service's startup warm-up to open pooled connections
+    return {"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "fake"}]}
+
+
+@app.post("/callback")
+async def callback():
+    # Stand-in for the result endpoint, so load runs can deliver callbacks locally
+    stats["callbacks"] += 1
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+    if ERROR_RATE and _rng.random() < ERROR_RATE:
+        stats["errors"] += 1
+        await asyncio.sleep(LATENCY * 0.1)
+        return JSONResponse(
+            status_code=ERROR_STATUS,
+            content={"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+            headers={"retry-after": "1"} if ERROR_STATUS == 429 else None,
+        )
+    global _in_flight
+    if MAX_CONCURRENCY and _in_flight >= MAX_CONCURRENCY:
+        stats["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            headers={"retry-after-ms": str(int(LATENCY * 1000))},
+        )
+    content = _canned_content(body)
+    if body.get("stream"):
+        return StreamingResponse(_stream_chunks(body, content), media_type="text/event-stream")
+    _in_flight += 1
+    try:
+        await asyncio.sleep(LATENCY)
+    finally:
+        _in_flight -= 1
+    return {
+        "id": f"chatcmpl-fake-{stats['calls']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 50, "completion_tokens": 10, "total_tokens": 60}
+    }
+
+
+async def _stream_chunks(body: Dict[str, Any], content: str):
+    # First token after a fraction of the latency, the rest spread over the remainder
+    words = content.split(" ")
+    await asyncio.sleep(LATENCY * 0.2)
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(LATENCY * 0.8 / max(1, len(words) - 1))
+        chunk = {
+            "id": f"chatcmpl-fake-{stats['calls']}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunk = {
+            "id": f"chatcmpl-fake-{stats['calls']}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [],
+            "usage": {"prompt_tokens": 50, "completion_tokens": len(words), "total_tokens": 50 + len(words)}
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def serve_in_thread(port: int = 8100) -> uvicorn.Server:
+    """
+    Starts the fake server on a background thread and waits until it accepts requests.
+    """
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("FAKE_LLM_PORT", "8100")))
@@ -0,0 +1,79 @@
+"""
+Exercises the LLM gateway against the fake server in two situations.
+
+Quota: the fake server accepts only --quota requests in flight and returns 429 for
+the rest. A burst of replies should settle near the quota and produce few local
+fallbacks, because the gateway backs off on Retry-After and shrinks its limit.
+
+Outage: every upstream call returns 500. Once the circuit breaker opens, replies
+should come back from the local pool without touching the network.
+
+    python -m benchmarks.gateway_benchmark --burst 200 --quota 8 --latency 0.2
+"""
+import os
+import time
+import asyncio
+import argparse
+
+
+async def burst(agent, Message, n: int, tag: str):
+    histories = [[Message(sender="scammer", text=f"{tag} {i}: your account is blocked, share OTP", timestamp="now")]
+                 for i in range(n)]
+    latencies = []
+
+    async def one(history):
+        start = time.perf_counter()
+        reply = await agent.generate_reply(history)
+        latencies.append(time.perf_counter() - start)
+        return reply
+
+    start = time.perf_counter()
+    replies = await asyncio.gather(*(one(h) for h in histories))
+    return replies, latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--quota", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    os.environ["FAKE_LLM_MAX_CONCURRENCY"] = str(args.quota)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    os.environ.setdefault("LLM_BREAKER_COOLDOWN", "60")
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+    from benchmarks import fake_openai_server
+    from agentic_honeypot.agent import HoneyPotAgent, LOCAL_REPLIES, gateway
+    from agentic_honeypot.models import Message
+
+    fake_openai_server.serve_in_thread(args.port)
+    agent = HoneyPotAgent()
+
+    asyncio.run(run(args, agent, Message, LOCAL_REPLIES, gateway, fake_openai_server))
+
+
+async def run(args, agent, Message, LOCAL_REPLIES, gateway, fake_openai_server):
+    # One event loop for both phases: the agent's pooled HTTP client is bound to it
+    replies, latencies, elapsed = await burst(agent, Message, args.burst, "quota")
+    fallbacks = sum(1 for r in replies if r in LOCAL_REPLIES)
+    print(f"Quota of {args.quota} in flight, burst of {args.burst}:")
+    print(f"  elapsed {elapsed:.2f}s, LLM replies {len(replies) - fallbacks}, local fallbacks {fallbacks}")
+    print(f"  upstream 429s {fake_openai_server.stats['throttled']}, gateway {gateway.stats()}")
+
+    fake_openai_server.ERROR_RATE = 1.0
+    fake_openai_server.ERROR_STATUS = 500
+    replies, latencies, elapsed = await burst(agent, Message, args.burst, "outage")
+    fallbacks = sum(1 for r in replies if r in LOCAL_REPLIES)
+    latencies.sort()
+    print(f"Upstream down, burst of {args.burst}:")
+    print(f"  elapsed {elapsed:.2f}s, local fallbacks {fallbacks}, median reply {latencies[len(latencies) // 2] * 1000:.1f}ms")
+    print(f"  upstream calls made {fake_openai_server.stats['errors']}, gateway {gateway.stats()}")
+
+
+if __name__ == "__main__":
+    main()
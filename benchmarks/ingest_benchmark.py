@@ -0,0 +1,77 @@
+"""
+Parse + serialize time per /analyze request, old ingest path vs the current one.
+
+Old: decode the body, json.loads it, build IncomingMessage(**data), then let FastAPI
+re-validate the returned AgentResponse and run jsonable_encoder + json.dumps.
+New: IncomingMessage.model_validate_json on the raw bytes and model_dump_json for
+the response (ingest.parse_message / ingest.model_response).
+
+    python -m benchmarks.ingest_benchmark --sizes 10,100,1000
+"""
+import json
+import time
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+
+from agentic_honeypot.models import IncomingMessage, AgentResponse
+from agentic_honeypot.ingest import parse_message, model_response
+
+TEXTS = [
+    "Sir aapka SBI account block ho gaya hai, KYC update karna padega turant",
+    "Haan sahab, kya karna hoga? Mujhe samajh nahi aaya, thoda Hindi mein batao",
+    "Is link pe click karo http://sbi-kyc-update.in aur details bharo, warna account band",
+    "Apna account number aur OTP batao, main update kar deta hu. Call 9876543210",
+]
+
+
+def payload(length: int) -> bytes:
+    history = [{"sender": "scammer" if i % 2 == 0 else "user", "text": TEXTS[i % len(TEXTS)],
+                "timestamp": "2026-01-01T10:00:00Z"} for i in range(length)]
+    return json.dumps({
+        "sessionId": "bench-session",
+        "message": {"sender": "scammer", "text": TEXTS[0], "timestamp": "2026-01-01T10:00:00Z"},
+        "conversationHistory": history,
+        "metadata": {"channel": "SMS", "language": "English", "locale": "IN"},
+    }).encode("utf-8")
+
+
+REPLY = AgentResponse(status="success", reply="Haan sahab, samajh nahi aaya. Aapka UPI ID kya hai?")
+
+
+def old_path(body: bytes) -> bytes:
+    data = json.loads(body.decode("utf-8"))
+    IncomingMessage(**data)
+    # FastAPI's serialize_response: validate against response_model, then encode
+    checked = AgentResponse.model_validate(REPLY.model_dump())
+    return json.dumps(jsonable_encoder(checked, exclude_none=True)).encode("utf-8")
+
+
+def new_path(body: bytes) -> bytes:
+    parse_message(body)
+    return model_response(REPLY).body
+
+
+def per_request(fn, body: bytes, budget: float = 0.5) -> float:
+    fn(body)
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < budget:
+        fn(body)
+        runs += 1
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000")
+    args = parser.parse_args()
+    print(f"{'history':>8} | {'body KB':>7} | {'old us/req':>10} | {'new us/req':>10} | {'speedup':>7}")
+    for size in (int(n) for n in args.sizes.split(",")):
+        body = payload(size)
+        old = per_request(old_path, body)
+        new = per_request(new_path, body)
+        print(f"{size:>8} | {len(body) / 1024:>7.1f} | {old * 1e6:>10.1f} | {new * 1e6:>10.1f} | {old / new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
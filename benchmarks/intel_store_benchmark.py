@@ -0,0 +1,95 @@
+"""
+Query latency of the intel store at millions of sightings.
+
+Fills a fresh SQLite file with --sightings synthetic (indicator, session) rows
+through the store's batched writer. Indicator reuse is skewed, so a few UPI IDs
+and domains show up in many sessions, like real scam campaigns. It then times the
+lookups the service and the /intel endpoints make.
+
+    python -m benchmarks.intel_store_benchmark --sightings 2000000
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+
+from agentic_honeypot.intel_store import SQLiteIntelStore, INDICATOR_FIELDS
+
+
+def indicator(kind: str, n: int) -> str:
+    if kind == "upiIds":
+        return f"pay{n}@ybl"
+    if kind == "phoneNumbers":
+        return f"+91{9000000000 + n}"
+    if kind == "bankAccounts":
+        return str(100000000000 + n)
+    return f"http://kyc-update-{n % 5000}.in/verify/{n}"
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+async def timed(n: int, make_call):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await make_call()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+async def run(args):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.path + suffix):
+            os.remove(args.path + suffix)
+    store = SQLiteIntelStore(args.path)
+    rng = random.Random(args.seed)
+    pool = args.sightings // 10
+    now = time.time()
+
+    start = time.perf_counter()
+    batch = []
+    for i in range(args.sightings):
+        kind = INDICATOR_FIELDS[i % len(INDICATOR_FIELDS)]
+        # Pareto-skewed reuse: low indicator numbers recur across many sessions
+        n = min(pool - 1, int(rng.paretovariate(1.2)) - 1)
+        value = indicator(kind, n if rng.random() < 0.5 else rng.randrange(pool))
+        domain = value.split("/")[2] if kind == "phishingLinks" else None
+        # Spread first sightings over the last day
+        batch.append((kind, value, f"session-{i // 4}", now - rng.random() * 86400, domain))
+        if len(batch) == args.batch:
+            await store._write(batch)
+            batch = []
+    if batch:
+        await store._write(batch)
+    elapsed = time.perf_counter() - start
+    print(f"wrote {args.sightings} sightings in {elapsed:.1f}s ({args.sightings / elapsed:,.0f}/s, "
+          f"batches of {args.batch}), db {os.path.getsize(args.path) / 1e6:.0f} MB")
+
+    hot = lambda: store.sessions_for("upiIds", indicator("upiIds", 0), 100)
+    cold = lambda: store.sessions_for("upiIds", indicator("upiIds", rng.randrange(pool)), 100)
+    known = lambda: store.known("new-session", {"upiIds": [indicator("upiIds", rng.randrange(pool))],
+                                                "phoneNumbers": [indicator("phoneNumbers", rng.randrange(pool))]})
+    top = lambda: store.top_domains(3600, 10)
+    for name, call, n in (("sessions for a hot UPI ID", hot, 200), ("sessions for a random UPI ID", cold, 500),
+                          ("known() for 2 new indicators", known, 500), ("top domains, last hour", top, 50)):
+        p50, p99 = await timed(n, call)
+        print(f"{name:<30} p50 {p50:6.2f}ms  p99 {p99:6.2f}ms")
+    await store.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sightings", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--path", default="/tmp/intel_benchmark.db")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Load generator for /analyze.
+
+Replays multi-turn scammer conversations from a JSONL file across many concurrent
+sessionIds. Each turn sends the history built from earlier replies, as a real
+client would. Lines with a "messages" list are full conversations. Any other line
+is treated as a one-message conversation using its "text", "body" or "message" field.
+
+With --delta, clients use delta mode: only the new message and the historyHash from
+the previous response are sent, and the server uses its stored history.
+
+By default everything runs in one process: the app is driven through httpx's ASGI
+transport with its lifespan running, and the LLM (and callback endpoint) is the local
+fake server. Latency, error rate and session assignment are all seeded, and speculation
+and the reply pool are off unless set, so the LLM calls of a run repeat exactly. The
+session store size and process memory are reported separately. Pass --url to load a
+running server instead.
+
+    python -m benchmarks.load_test --sessions 2000 --concurrency 200 --json-out run.json
+    python -m benchmarks.load_test --sessions 2000 --baseline run.json   # exits 1 on regression
+    python -m benchmarks.load_test --sessions 2000 --delta
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+DEFAULT_CONVERSATIONS = os.path.join(os.path.dirname(__file__), "data", "conversations.jsonl")
+
+
+def load_conversations(path: str) -> List[List[str]]:
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if isinstance(row.get("messages"), list):
+                turns = [m if isinstance(m, str) else m.get("text", "") for m in row["messages"]]
+            else:
+                turns = [next((row[k] for k in ("text", "body", "message") if isinstance(row.get(k), str)), "")]
+            turns = [t for t in turns if t]
+            if turns:
+                conversations.append(turns)
+    if not conversations:
+        raise SystemExit(f"No conversations found in {path}")
+    return conversations
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def run_session(client, session_id: str, turns: List[str], headers: Dict, latencies: List[float],
+                      errors: List[str], sent: List[int], delta: bool = False):
+    history = []
+    history_hash = ""
+    for text in turns:
+        message = {"sender": "scammer", "text": text, "timestamp": "2026-01-01T00:00:00Z"}
+        payload = {"sessionId": session_id, "message": message,
+                   "metadata": {"channel": "SMS", "language": "English", "locale": "IN"}}
+        if delta:
+            payload["historyHash"] = history_hash
+        else:
+            payload["conversationHistory"] = history
+        body = json.dumps(payload).encode("utf-8")
+        start = time.perf_counter()
+        try:
+            response = await client.post("/analyze", content=body, headers={**headers, "content-type": "application/json"})
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") == "resync":
+                raise RuntimeError(f"history resync requested for {session_id}")
+            reply = data.get("reply", "")
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - start)
+        sent.append(len(body))
+        history_hash = data.get("historyHash", "")
+        history = history + [message, {"sender": "user", "text": reply, "timestamp": "2026-01-01T00:00:01Z"}]
+
+
+async def run_load(client, conversations: List[List[str]], sessions: int, concurrency: int, seed: int, headers: Dict,
+                   delta: bool = False) -> Dict:
+    rng = random.Random(seed)
+    plan = [(f"load-{seed}-{i}", rng.choice(conversations)) for i in range(sessions)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+    sent: List[int] = []
+
+    async def bounded(session_id, turns):
+        async with semaphore:
+            await run_session(client, session_id, turns, headers, latencies, errors, sent, delta)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(sid, turns) for sid, turns in plan))
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "elapsedSec": round(elapsed, 3),
+        "turnsPerSec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "requestBytes": {"mean": round(sum(sent) / len(sent)) if sent else 0, "max": max(sent, default=0)},
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+        },
+    }
+
+
+async def in_process(args, conversations) -> Dict:
+    import httpx
+    from benchmarks import fake_openai_server
+    from agentic_honeypot.main import app
+    from agentic_honeypot import service
+
+    fake_openai_server.serve_in_thread(args.fake_port)
+    headers = {"x-api-key": os.getenv("HONEYPOT_API_KEY", "secret-key-123")}
+
+    # ASGITransport doesn't run the lifespan; without it the callback dispatcher and the
+    # intel store never start, and their queues only grow
+    async with app.router.lifespan_context(app):
+        store_before = await service.sessions.size()
+        rss_before = rss_bytes()
+        calls_before = fake_openai_server.stats["calls"]
+
+        transport = httpx.ASGITransport(app=app)
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120, limits=limits) as client:
+            summary = await run_load(client, conversations, args.sessions, args.concurrency, args.seed, headers, args.delta)
+
+        store_after = await service.sessions.size()
+        rss_growth = rss_bytes() - rss_before
+        llm_calls = fake_openai_server.stats["calls"] - calls_before
+        queues = {"callbacks": service.callback_dispatcher.queue.qsize(),
+                  "intel": service.intel_store.stats().get("queueDepth", 0)}
+    summary.update({
+        "llmCalls": llm_calls,
+        "llmErrors": fake_openai_server.stats["errors"],
+        "llmCallsPerTurn": round(llm_calls / summary["turns"], 3) if summary["turns"] else 0.0,
+        "sessionStore": {"before": store_before, "after": store_after},
+        # Process RSS, so it also covers caches and allocator slack; queues are reported
+        # so a backlog can be told apart from session growth
+        "memory": {
+            "rssGrowthBytes": rss_growth,
+            "rssBytesPerSession": round(rss_growth / max(1, store_after - store_before)),
+            "queuedAtEnd": queues,
+        },
+    })
+    return summary
+
+
+async def remote(args, conversations) -> Dict:
+    import httpx
+    headers = {"x-api-key": args.api_key}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=120, limits=limits) as client:
+        return await run_load(client, conversations, args.sessions, args.concurrency, args.seed, headers, args.delta)
+
+
+def compare(summary: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for key in ("p95", "p99"):
+        old, new = baseline["latencyMs"][key], summary["latencyMs"][key]
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"{key} latency {old}ms -> {new}ms")
+    if baseline["turnsPerSec"] and summary["turnsPerSec"] < baseline["turnsPerSec"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['turnsPerSec']} -> {summary['turnsPerSec']} turns/s")
+    if "llmCallsPerTurn" in baseline and summary.get("llmCallsPerTurn", 0) > baseline["llmCallsPerTurn"] * (1 + tolerance):
+        regressions.append(f"LLM calls/turn {baseline['llmCallsPerTurn']} -> {summary['llmCallsPerTurn']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-port", type=int, default=8100)
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--delta", action="store_true", help="Send only the new message plus historyHash")
+    parser.add_argument("--api-key", default=os.getenv("HONEYPOT_API_KEY", "secret-key-123"))
+    parser.add_argument("--json-out", help="Write the summary here")
+    parser.add_argument("--baseline", help="Summary from an earlier run; exit 1 if this run regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    conversations = load_conversations(args.conversations)
+
+    if args.url:
+        summary = asyncio.run(remote(args, conversations))
+    else:
+        # Configure the fake LLM and point the app at it before anything imports the agent
+        os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+        os.environ["FAKE_LLM_ERROR_RATE"] = str(args.llm_error_rate)
+        os.environ["FAKE_LLM_SEED"] = str(args.seed)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.fake_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+        os.environ.setdefault("CALLBACK_URL", f"http://127.0.0.1:{args.fake_port}/callback")
+        # Files the app writes go to a fresh directory; an intel.db left by an earlier
+        # run would turn its indicators into known-indicator hits and change the LLM calls
+        workdir = tempfile.mkdtemp(prefix="load-")
+        os.environ.setdefault("CALLBACK_SPOOL_DIR", os.path.join(workdir, "spool"))
+        os.environ.setdefault("INTEL_DB_PATH", os.path.join(workdir, "intel.db"))
+        os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+        # LLM calls per turn must not depend on timing: speculative replies race the
+        # verdict, and how many concurrent openers miss a filling reply pool varies.
+        # Set PLAN_POLICY / REPLY_POOL_SIZE to measure those, at the cost of repeatability.
+        os.environ.setdefault("PLAN_POLICY", "sequential")
+        os.environ.setdefault("REPLY_POOL_SIZE", "0")
+        # Backoff jitter and log sampling draw from the global generator
+        random.seed(args.seed)
+        summary = asyncio.run(in_process(args, conversations))
+
+    print(json.dumps(summary, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
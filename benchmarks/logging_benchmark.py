@@ -0,0 +1,87 @@
+"""
+Requests/sec through the full ASGI stack with request logging on, sampled and off.
+
+Posts a benign message with a large conversationHistory to /analyze in-process via
+httpx's ASGI transport. The local detector clears the message, so no LLM is involved
+and the numbers reflect framework + logging overhead. Log output goes to a temp file.
+
+Throughput drifts over a run in one process, so the three settings take turns over
+--rounds rounds, each round starting with a different one, and medians are reported.
+
+    python -m benchmarks.logging_benchmark --requests 500 --rounds 5 --history 200
+"""
+import os
+import time
+import statistics
+import asyncio
+import tempfile
+import argparse
+
+
+def make_payload(history_len: int) -> dict:
+    history = [
+        {"sender": "scammer" if i % 2 == 0 else "user", "text": f"Message number {i} in a long conversation", "timestamp": "2026-01-01T00:00:00Z"}
+        for i in range(history_len)
+    ]
+    return {
+        "sessionId": "log-bench",
+        "message": {"sender": "scammer", "text": "Hi, are we still meeting for lunch tomorrow?", "timestamp": "now"},
+        "conversationHistory": history,
+        "metadata": {"channel": "SMS", "language": "English", "locale": "IN"},
+    }
+
+
+async def run(app, payload: dict, requests: int, concurrency: int) -> float:
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"x-api-key": os.getenv("HONEYPOT_API_KEY", "secret-key-123")}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                response = await client.post("/analyze", json=payload, headers=headers)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="requests per setting per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--history", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    os.environ.setdefault("CALLBACK_SPOOL_DIR", tempfile.mkdtemp())
+    from agentic_honeypot import logs
+    log_file = tempfile.NamedTemporaryFile("w", suffix=".log", delete=False)
+    logs.setup_logging(stream=log_file)
+    from agentic_honeypot.main import app
+
+    payload = make_payload(args.history)
+    logs.LOG_SAMPLE_RATE = 0.0
+    asyncio.run(run(app, payload, 100, args.concurrency))  # warm-up: classifier training, imports
+    print(f"{args.requests} requests x {args.rounds} rounds, history of {args.history} messages, "
+          f"concurrency {args.concurrency}")
+    settings = [("logging on", 1.0), ("sampled 10%", 0.1), ("logging off", 0.0)]
+    results = {label: [] for label, _ in settings}
+    for round_ in range(args.rounds):
+        # Rotate the order so no setting always runs first or last
+        for label, rate in settings[round_ % len(settings):] + settings[:round_ % len(settings)]:
+            logs.LOG_SAMPLE_RATE = rate
+            results[label].append(asyncio.run(run(app, payload, args.requests, args.concurrency)))
+    for label, _ in settings:
+        rates = results[label]
+        print(f"{label:>12}: {statistics.median(rates):8.0f} req/s median  "
+              f"(min {min(rates):.0f}, max {max(rates):.0f})")
+    logs.stop_logging()
+    print(f"log output: {log_file.name} ({os.path.getsize(log_file.name)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compares the execution planner's policies on first-turn latency and token spend.
+
+Every message in a labeled JSONL corpus opens a new session. Detection goes through
+TieredScamDetector; the LLM is simulated (detection answers with the true label after
+--detect-latency, a reply takes --reply-latency and --reply-tokens). A scam needs a
+reply; a benign message needs none, so a reply speculated for it is wasted spend.
+
+With the default thresholds most messages are settled locally and no policy has
+anything to overlap; --escalate-all sends every message to the LLM instead.
+
+    python -m benchmarks.planner_benchmark --detect-latency 0.8 --reply-latency 1.2 --escalate-all
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+from agentic_honeypot.classifier import TieredScamDetector, ScamClassifier, SCAM_THRESHOLD, BENIGN_THRESHOLD
+from agentic_honeypot.planner import ExecutionPlanner, POLICIES
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "labeled_messages.jsonl")
+
+
+class StubLLM:
+    """
+    Stands in for HoneyPotAgent: detection returns the label, replies cost tokens.
+    Cancelled replies are charged too, since the upstream bills what it already sent.
+    """
+
+    def __init__(self, labels, detect_latency: float, reply_latency: float, reply_tokens: int):
+        self.labels = labels
+        self.detect_latency = detect_latency
+        self.reply_latency = reply_latency
+        self.reply_tokens = reply_tokens
+        self.reply_calls = 0
+        self.reply_tokens_used = 0
+
+    async def detect_scam(self, text: str) -> bool:
+        await asyncio.sleep(self.detect_latency)
+        return bool(self.labels[text])
+
+    async def generate_reply(self) -> str:
+        self.reply_calls += 1
+        self.reply_tokens_used += self.reply_tokens
+        await asyncio.sleep(self.reply_latency)
+        return "Haan sahab, bataiye"
+
+
+async def first_turn(planner: ExecutionPlanner, llm: StubLLM, text: str) -> float:
+    start = time.perf_counter()
+    is_scam, reply = await planner.detect_and_reply(text, llm.generate_reply)
+    if is_scam and reply is None:
+        await llm.generate_reply()
+    return time.perf_counter() - start
+
+
+async def run_policy(policy: str, rows, labels, args, scam_threshold: float, benign_threshold: float):
+    llm = StubLLM(labels, args.detect_latency, args.reply_latency, args.reply_tokens)
+    detector = TieredScamDetector(llm, ScamClassifier.from_corpus(), scam_threshold, benign_threshold)
+    planner = ExecutionPlanner(detector, policy, tokens_per_minute=args.speculation_tpm,
+                               reply_tokens=args.reply_tokens)
+    # Sessions arrive concurrently, as they would across clients
+    latencies = sorted(await asyncio.gather(*(first_turn(planner, llm, row["text"]) for row in rows)))
+    return latencies, llm, planner
+
+
+async def run(args):
+    with open(args.corpus, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    labels = {row["text"]: row["label"] for row in rows}
+    scams = sum(1 for row in rows if row["label"])
+    scam_threshold, benign_threshold = (1.01, -0.01) if args.escalate_all else (SCAM_THRESHOLD, BENIGN_THRESHOLD)
+
+    print(f"messages: {len(rows)} ({scams} scam), detect {args.detect_latency}s, "
+          f"reply {args.reply_latency}s / {args.reply_tokens} tokens, escalate all: {args.escalate_all}")
+    print(f"{'policy':<12} {'mean':>7} {'p95':>7} {'replies':>8} {'wasted':>7} {'extra tokens':>13}")
+    for policy in args.policies:
+        latencies, llm, planner = await run_policy(policy, rows, labels, args, scam_threshold, benign_threshold)
+        mean = sum(latencies) / len(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        extra = (llm.reply_calls - scams) * args.reply_tokens
+        print(f"{policy:<12} {mean:>6.2f}s {p95:>6.2f}s {llm.reply_calls:>8} "
+              f"{planner.counters['speculationWasted']:>7} {extra:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--detect-latency", type=float, default=0.8)
+    parser.add_argument("--reply-latency", type=float, default=1.2)
+    parser.add_argument("--reply-tokens", type=int, default=600)
+    parser.add_argument("--speculation-tpm", type=float, default=20000)
+    parser.add_argument("--escalate-all", action="store_true")
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=POLICIES)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
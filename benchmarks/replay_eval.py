@@ -0,0 +1,218 @@
+"""
+Offline evaluation of the agent pipeline on recorded LLM answers.
+
+Each conversation in a JSONL file is sent turn by turn through process_message, with
+the history built from earlier replies, as a client would. Lines are
+{"id", "messages": [...], "scam": bool, "intel": {field: [values]}}; "scam" and "intel"
+are the labels that detection accuracy and extraction recall are scored against.
+
+Record once against the live API (or any OpenAI-compatible server at OPENAI_BASE_URL):
+
+    python -m benchmarks.replay_eval --record recordings.jsonl
+
+then iterate offline, with no network, at CPU speed:
+
+    python -m benchmarks.replay_eval --replay recordings.jsonl --workers 4
+    python -m benchmarks.replay_eval --replay recordings.jsonl --env MAX_TURNS_BEFORE_CALLBACK=4
+
+LLM answers are looked up by a hash of the prompt (see agentic_honeypot/replay.py). A
+change that alters prompts, such as a smaller context budget, turns the affected calls
+into misses; they fail like an unreachable LLM would and are counted in the report.
+
+Conversations are split across worker processes, each running them one at a time, so
+per-turn LLM seconds and cost can be attributed to the turn. State shared between
+sessions is switched off in the workers (intel store, verdict cache, reply pool), so
+the report doesn't depend on how conversations were split. Latency is the sum of the
+recorded latencies of a turn's LLM calls, an upper bound when calls overlap; with
+--time-scale the answers are also slept for, and wall-clock turn times simulate overlap.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from agentic_honeypot.intel_store import INDICATOR_FIELDS
+from benchmarks.load_test import percentile
+
+DEFAULT_CONVERSATIONS = os.path.join(os.path.dirname(__file__), "data", "conversations.jsonl")
+
+
+def load_conversations(path: str, repeat: int) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    rows = [row for row in rows if isinstance(row.get("messages"), list) and row["messages"]]
+    if not rows:
+        raise SystemExit(f"No conversations found in {path}")
+    return [dict(row, id=f"{row.get('id', i)}-{r}") for r in range(repeat) for i, row in enumerate(rows)]
+
+
+def _init_worker(env: Dict[str, str]):
+    # Settings are read when agentic_honeypot is imported, which happens after this
+    os.environ.update(env)
+
+
+def run_chunk(conversations: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+    return asyncio.run(_run_chunk(conversations))
+
+
+async def _run_chunk(conversations: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+    from agentic_honeypot import service
+    from agentic_honeypot.agent import get_client, close_client
+
+    client = get_client()
+    results = [(index, await run_conversation(service, client, conversation)) for index, conversation in conversations]
+    await service.drain_background()
+    await close_client()
+    return results
+
+
+async def run_conversation(service, client, conversation: Dict) -> Dict:
+    from agentic_honeypot.models import IncomingMessage
+    from agentic_honeypot.intel_store import canonical_indicator
+
+    session_id = f"replay-{conversation['id']}"
+    dispatcher = service.callback_dispatcher
+    history: List[Dict] = []
+    turns = []
+    callback_turn, reported = None, None
+    for turn, text in enumerate(conversation["messages"], 1):
+        message = {"sender": "scammer", "text": text, "timestamp": "2026-01-01T00:00:00Z"}
+        llm_seconds, cost = client.llm_seconds, client.cost
+        calls, misses = client.counters["calls"], client.counters.get("misses", 0)
+        start = time.perf_counter()
+        response = await service.process_message(
+            IncomingMessage.model_validate({"sessionId": session_id, "message": message, "conversationHistory": history}))
+        turns.append({
+            "seconds": time.perf_counter() - start,
+            "llmSeconds": round(client.llm_seconds - llm_seconds, 4),
+            "cost": round(client.cost - cost, 8),
+            "llmCalls": client.counters["calls"] - calls,
+            "llmMisses": client.counters.get("misses", 0) - misses,
+        })
+        # The dispatcher isn't started here, so a report stays in its queue
+        while not dispatcher.queue.empty():
+            _, payload, _ = dispatcher.queue.get_nowait()
+            if callback_turn is None:
+                callback_turn, reported = turn, payload["extractedIntelligence"]
+        history = history + [message, {"sender": "user", "text": response.reply, "timestamp": "2026-01-01T00:00:01Z"}]
+
+    session = await service.sessions.get(session_id)
+    extracted = session.intel.model_dump() if session is not None else {}
+    recall = {}
+    for field in INDICATOR_FIELDS:
+        expected = {canonical_indicator(field, v) for v in (conversation.get("intel") or {}).get(field, [])}
+        if not expected:
+            continue
+        found_reported = {canonical_indicator(field, v) for v in (reported or {}).get(field, [])}
+        found_extracted = {canonical_indicator(field, v) for v in extracted.get(field, [])}
+        recall[field] = (len(expected), len(expected & found_reported), len(expected & found_extracted))
+    return {
+        "id": conversation["id"],
+        "scam": conversation.get("scam"),
+        "flagged": bool(session is not None and session.scam_detected),
+        "turns": turns,
+        "callbackTurn": callback_turn,
+        "recall": recall,
+        "replies": [m["text"] for m in history if m["sender"] == "user"],
+    }
+
+
+def worker_env(args, workdir: str) -> Dict[str, str]:
+    env = {
+        "INTEL_STORE": "off",
+        "SESSION_STORE": "memory",
+        "CACHE_MAX_ENTRIES": "0",
+        "REPLY_VARIATION": "1",
+        "INTEL_DB_PATH": os.path.join(workdir, "intel.db"),
+        "CALLBACK_SPOOL_DIR": os.path.join(workdir, "spool"),
+        "CALLBACK_URL": "http://127.0.0.1:9/unused",
+        "LOG_LEVEL": "CRITICAL",
+        "LLM_REPLAY_TIME_SCALE": str(args.time_scale),
+    }
+    if args.replay:
+        env["LLM_REPLAY_PATH"] = os.path.abspath(args.replay)
+    else:
+        env["LLM_RECORD_PATH"] = os.path.abspath(args.record)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    turns = [t for r in results for t in r["turns"]]
+    scams = [r for r in results if r["scam"] is True]
+    benign = [r for r in results if r["scam"] is False]
+    callbacks = sorted(r["callbackTurn"] for r in results if r["callbackTurn"] is not None)
+    recall = {}
+    for field in INDICATOR_FIELDS:
+        counts = [r["recall"][field] for r in results if field in r["recall"]]
+        expected = sum(c[0] for c in counts)
+        if expected:
+            recall[field] = {"expected": expected,
+                             "reported": round(sum(c[1] for c in counts) / expected, 3),
+                             "extracted": round(sum(c[2] for c in counts) / expected, 3)}
+    llm_seconds = sorted(t["llmSeconds"] for t in turns)
+    seconds = sorted(t["seconds"] for t in turns)
+    cost = sum(t["cost"] for t in turns)
+    return {
+        "conversations": len(results),
+        "turns": len(turns),
+        "elapsedSeconds": round(elapsed, 2),
+        "detection": {"scamsFlagged": sum(r["flagged"] for r in scams), "scams": len(scams),
+                      "falsePositives": sum(r["flagged"] for r in benign), "benign": len(benign)},
+        "callbacks": {"sent": len(callbacks), "turnsToCallback": {
+            "mean": round(sum(callbacks) / len(callbacks), 2) if callbacks else None,
+            "p50": percentile(callbacks, 50) if callbacks else None}},
+        "recall": recall,
+        "llm": {"calls": sum(t["llmCalls"] for t in turns),
+                "replayMisses": sum(t["llmMisses"] for t in turns),
+                "turnSecondsP50": round(percentile(llm_seconds, 50), 3),
+                "turnSecondsP95": round(percentile(llm_seconds, 95), 3),
+                "costUsd": round(cost, 6),
+                "costPerConversationUsd": round(cost / len(results), 6)},
+        "turnMs": {"p50": round(percentile(seconds, 50) * 1000, 2), "p95": round(percentile(seconds, 95) * 1000, 2)},
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--replay", help="answer LLM calls from this recording, offline")
+    mode.add_argument("--record", help="call the LLM and append its answers to this recording")
+    parser.add_argument("--conversations", default=DEFAULT_CONVERSATIONS)
+    parser.add_argument("--repeat", type=int, default=1, help="run every conversation this many times")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--time-scale", type=float, default=0.0,
+                        help="sleep recorded LLM latency times this factor (replay only)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="setting for the workers, e.g. MAX_TURNS_BEFORE_CALLBACK=4")
+    parser.add_argument("--json-out", help="write the summary and per-conversation results here")
+    args = parser.parse_args(argv)
+
+    conversations = list(enumerate(load_conversations(args.conversations, args.repeat)))
+    workers = max(1, min(args.workers, len(conversations)))
+    chunks = [conversations[i::workers] for i in range(workers)]
+    env = worker_env(args, tempfile.mkdtemp(prefix="replay-"))
+
+    start = time.perf_counter()
+    # Fresh interpreters, so each worker imports agentic_honeypot under env
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                             initargs=(env,)) as pool:
+        results = [result for chunk in pool.map(run_chunk, chunks) for result in chunk]
+    results = [result for _, result in sorted(results, key=lambda item: item[0])]
+    summary = summarize(results, time.perf_counter() - start)
+
+    print(json.dumps(summary, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "conversations": results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
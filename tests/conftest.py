@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+# Settings are read when agentic_honeypot is imported, so they are set before any test
+# module imports it: no stray files in the checkout, no network, quiet logs
+_tmp = tempfile.mkdtemp(prefix="honeypot-tests-")
+os.environ.setdefault("INTEL_DB_PATH", os.path.join(_tmp, "intel.db"))
+os.environ.setdefault("CALLBACK_SPOOL_DIR", os.path.join(_tmp, "spool"))
+os.environ.setdefault("CALLBACK_URL", "http://127.0.0.1:9/unused")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+# Nothing listens here: LLM calls fail at once and take the fallback paths
+os.environ.setdefault("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+os.environ.setdefault("LLM_MAX_RETRIES", "0")
@@ -0,0 +1,37 @@
+import json
+import asyncio
+
+import httpx
+
+from agentic_honeypot.main import app, EXPECTED_API_KEY
+from agentic_honeypot.models import IncomingMessage
+from agentic_honeypot.service import process_batch
+
+
+async def post_batch(body: bytes):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/analyze/batch", content=body, headers={"x-api-key": EXPECTED_API_KEY})
+
+
+def test_null_message_errors_only_that_item():
+    items = [
+        {"sessionId": "batch-ok-1", "message": {"sender": "scammer", "text": "Hi, are we meeting for lunch tomorrow?"}},
+        {"sessionId": "batch-null", "message": None},
+        {"sessionId": "batch-ok-2", "message": {"sender": "scammer", "text": "Let me know what time works for you"}},
+    ]
+    response = asyncio.run(post_batch(json.dumps(items).encode()))
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["status"] for line in lines] == ["success", "error", "success"]
+
+
+def test_process_batch_survives_null_message():
+    messages = [IncomingMessage(sessionId="direct-null", message=None),
+                IncomingMessage(sessionId="direct-ok", message={"sender": "scammer", "text": "hello"})]
+
+    async def run():
+        return [response async for _, response in process_batch(messages)]
+
+    assert len(asyncio.run(run())) == 2
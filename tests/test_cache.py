@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from agentic_honeypot.cache import SimHashIndex
+
+
+def flip(value: int, bits) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 6, 10])
+def test_finds_every_hash_within_max_distance(max_distance):
+    rng = random.Random(max_distance)
+    index = SimHashIndex(max_distance)
+    for i in range(200):
+        value = rng.getrandbits(64)
+        index.add(f"k{i}", value)
+        near = flip(value, rng.sample(range(64), max_distance))
+        assert index.nearest(near) == f"k{i}"
+        index.remove(f"k{i}")
+
+
+def test_ignores_hashes_beyond_max_distance():
+    index = SimHashIndex(3)
+    index.add("k", 0)
+    assert index.nearest(flip(0, range(4))) is None
+
+
+def test_rejects_impossible_distances():
+    with pytest.raises(ValueError):
+        SimHashIndex(64)
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import asyncio
+import subprocess
+
+import httpx
+
+from agentic_honeypot import callbacks
+from agentic_honeypot.callbacks import CallbackDispatcher, CLAIM_SUFFIX, claim_owner
+from agentic_honeypot.metrics import CALLBACK_SECONDS
+
+URL = "http://callback.test/result"
+
+
+def spool_file(directory, name, payload=None):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        json.dump(payload or {"sessionId": name}, f)
+    return path
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def observed(outcome: str) -> int:
+    series = CALLBACK_SECONDS._series.get((outcome,))
+    return series[2] if series else 0
+
+
+def responder(*statuses):
+    """
+    A MockTransport answering with these statuses in turn, recording each posted payload.
+    """
+    posted = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        posted.append(json.loads(request.content))
+        return httpx.Response(statuses[min(len(posted), len(statuses)) - 1])
+
+    return httpx.MockTransport(handle), posted
+
+
+def deliver(tmp_path, transport, payload, max_retries=3):
+    """
+    Enqueues one payload, lets the workers settle it, and returns the dispatcher.
+    """
+    dispatcher = CallbackDispatcher(URL, spool_dir=str(tmp_path), workers=1, max_retries=max_retries,
+                                    base_delay=0.01, max_delay=0.02, transport=transport)
+
+    async def main():
+        await dispatcher.start()
+        await dispatcher.enqueue(payload)
+        await dispatcher.stop(drain_timeout=5)
+
+    asyncio.run(main())
+    return dispatcher
+
+
+def test_delivered_payload_leaves_the_spool(tmp_path):
+    transport, posted = responder(200)
+    before = observed("delivered")
+    dispatcher = deliver(tmp_path, transport, {"sessionId": "s-1"})
+    assert posted == [{"sessionId": "s-1"}]
+    assert os.listdir(tmp_path) == []
+    assert dispatcher.counters["delivered"] == 1 and dispatcher.counters["retries"] == 0
+    assert observed("delivered") == before + 1
+    assert len(dispatcher.latency.samples) == 1
+
+
+def test_429_and_5xx_are_retried(tmp_path):
+    transport, posted = responder(503, 429, 200)
+    dispatcher = deliver(tmp_path, transport, {"sessionId": "s-1"})
+    assert len(posted) == 3
+    assert dispatcher.counters["retries"] == 2 and dispatcher.counters["delivered"] == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_other_4xx_is_not_retried_and_kept_as_failed(tmp_path):
+    transport, posted = responder(400)
+    before = observed("rejected")
+    dispatcher = deliver(tmp_path, transport, {"sessionId": "s-1"})
+    assert len(posted) == 1
+    assert dispatcher.counters["failed"] == 1 and dispatcher.counters["retries"] == 0
+    assert observed("rejected") == before + 1
+    [name] = os.listdir(tmp_path)
+    assert name.endswith("-s-1.json.failed")
+
+
+def test_retries_give_up_and_leave_payload_in_spool(tmp_path):
+    transport, posted = responder(500)
+    before = observed("failed")
+    dispatcher = deliver(tmp_path, transport, {"sessionId": "s-1"}, max_retries=2)
+    assert len(posted) == 3
+    assert dispatcher.counters["failed"] == 1
+    assert observed("failed") == before + 1
+    # Still claimed by this process; picked up again on the next start
+    [name] = os.listdir(tmp_path)
+    assert name.endswith(f"-s-1.json{CLAIM_SUFFIX}{claim_owner()}")
+
+
+def test_spooled_payload_is_posted_by_one_process_only(tmp_path, monkeypatch):
+    spool_file(str(tmp_path), "1-a.json")
+    first = CallbackDispatcher(URL, spool_dir=str(tmp_path))
+    first._load_spool()
+    assert first.queue.qsize() == 1
+    assert os.listdir(tmp_path) == [f"1-a.json{CLAIM_SUFFIX}{claim_owner()}"]
+
+    # Another live server process sharing the spool leaves the claimed file alone
+    monkeypatch.setattr(callbacks.os, "getpid", os.getppid)
+    second = CallbackDispatcher(URL, spool_dir=str(tmp_path))
+    second._load_spool()
+    assert second.queue.qsize() == 0
+
+
+def test_claims_of_exited_processes_on_this_host_are_taken_over(tmp_path):
+    host = claim_owner().rpartition("@")[0]
+    spool_file(str(tmp_path), f"1-a.json{CLAIM_SUFFIX}{host}@{dead_pid()}")
+    spool_file(str(tmp_path), f"2-b.json{CLAIM_SUFFIX}{host}@{os.getppid()}")
+    # Same pid, other host (another container): its liveness can't be checked here
+    spool_file(str(tmp_path), f"3-c.json{CLAIM_SUFFIX}other-host@{os.getpid()}")
+    spool_file(str(tmp_path), "4-d.failed")
+    dispatcher = CallbackDispatcher(URL, spool_dir=str(tmp_path))
+    dispatcher._load_spool()
+    path, payload, _ = dispatcher.queue.get_nowait()
+    assert payload["sessionId"].startswith("1-a.json")
+    assert path.endswith(f"1-a.json{CLAIM_SUFFIX}{claim_owner()}")
+    assert dispatcher.queue.empty()
+
+
+def test_enqueue_spools_under_own_claim(tmp_path):
+    dispatcher = CallbackDispatcher(URL, spool_dir=str(tmp_path))
+    assert asyncio.run(dispatcher.enqueue({"sessionId": "s-1"}))
+    path, payload, _ = dispatcher.queue.get_nowait()
+    assert payload == {"sessionId": "s-1"}
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    assert path.endswith(f"-s-1.json{CLAIM_SUFFIX}{claim_owner()}")
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from agentic_honeypot.agent import HoneyPotAgent
+from agentic_honeypot.cache import ResponseCache
+from agentic_honeypot.classifier import TieredScamDetector
+from agentic_honeypot.gateway import LLMGateway
+
+# Thresholds that send every message to the LLM
+ESCALATE_ALL = {"scam_threshold": 1.01, "benign_threshold": -0.01}
+TEXT = "Sir your parcel is pending, please confirm your details"
+
+
+class StubAgent:
+    def __init__(self, verdict):
+        self.verdict = verdict
+        self.calls = 0
+        self.llm_available = True
+
+    async def detect_scam(self, text):
+        self.calls += 1
+        return self.verdict
+
+
+def test_llm_verdict_is_cached():
+    cache = ResponseCache()
+    agent = StubAgent(True)
+    detector = TieredScamDetector(agent, cache=cache, **ESCALATE_ALL)
+    assert asyncio.run(detector.detect(TEXT)) is True
+    assert cache.get_verdict(TEXT) is True
+    assert asyncio.run(detector.detect(TEXT)) is True
+    assert agent.calls == 1
+
+
+def test_failed_llm_call_is_not_cached_as_benign():
+    cache = ResponseCache()
+    agent = StubAgent(None)
+    detector = TieredScamDetector(agent, cache=cache, **ESCALATE_ALL)
+    verdict = asyncio.run(detector.detect(TEXT))
+    assert verdict == (detector.classifier.score(TEXT) >= 0.5)
+    assert cache.get_verdict(TEXT) is None
+    assert detector.counters["degraded"] == 1
+    # Once the LLM answers again, the message gets a real verdict
+    agent.verdict = True
+    assert asyncio.run(detector.detect(TEXT)) is True
+    assert cache.get_verdict(TEXT) is True
+
+
+def test_agent_reports_failed_detection_as_none():
+    async def unreachable(**request):
+        raise openai.APIConnectionError(request=httpx.Request("POST", "http://llm.test"))
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=unreachable)))
+    agent = HoneyPotAgent(client=client, llm_gateway=LLMGateway(max_retries=0))
+    assert asyncio.run(agent.detect_scam(TEXT)) is None
+
+
+def test_reply_pool_size_zero_disables_pooling():
+    cache = ResponseCache(pool_size=0)
+    cache.add_first_turn_reply(TEXT, "Haan sahab?", "ramu_kaka")
+    assert cache.first_turn_reply(TEXT, "ramu_kaka") is None
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from benchmarks import cold_start, fake_openai_server
+
+IMPORT_BUDGET = 1.0
+COLD_START_BUDGET = 3.0
+
+
+@pytest.fixture(scope="module")
+def llm_port():
+    port = cold_start.free_port()
+    server = fake_openai_server.serve_in_thread(port)
+    yield port
+    server.should_exit = True
+
+
+def test_import_is_within_budget_and_has_no_side_effects(tmp_path, llm_port):
+    env = cold_start.service_env(str(tmp_path), llm_port, "startup")
+    env["SESSION_STORE"] = "sqlite"
+    result = min((cold_start.measure_import(env, str(tmp_path)) for _ in range(2)), key=lambda r: r["seconds"])
+    assert result["seconds"] < IMPORT_BUDGET
+    assert not result["openai"]
+    # Databases and the callback spool are opened by the lifespan, not by the import
+    assert os.listdir(tmp_path) == []
+
+
+def test_first_answer_is_within_cold_start_budget(tmp_path, llm_port):
+    env = cold_start.service_env(str(tmp_path), llm_port, "startup")
+    result = min((cold_start.measure_cold_start(env, str(tmp_path), timeout=COLD_START_BUDGET * 5) for _ in range(2)),
+                 key=lambda r: r["coldStart"])
+    assert result["coldStart"] < COLD_START_BUDGET
+    assert os.path.isdir(tmp_path / "spool")
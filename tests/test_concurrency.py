@@ -0,0 +1,21 @@
+import os
+import re
+import sys
+import subprocess
+
+from benchmarks.cold_start import ROOT, free_port
+
+SESSIONS = 10
+
+
+def test_concurrent_sessions_take_about_as_long_as_one():
+    # A fresh interpreter: the benchmark points the LLM client at its fake server before importing the service
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.async_concurrency", "--sessions", str(SESSIONS), "--latency", "0.3",
+         "--port", str(free_port())],
+        cwd=ROOT, env=dict(os.environ, LOG_LEVEL="CRITICAL"), capture_output=True, text=True, timeout=120, check=True,
+    ).stdout
+    ratios = dict(re.findall(r"sessions (sequential|concurrent):.*\(([\d.]+)x\)", out))
+    # Sequential sessions each wait for the fake LLM, so the measurement is real
+    assert float(ratios["sequential"]) > SESSIONS / 2
+    assert float(ratios["concurrent"]) < 3
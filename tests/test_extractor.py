@@ -0,0 +1,57 @@
+from agentic_honeypot.extractor import IntelExtractor
+
+extractor = IntelExtractor()
+
+
+def test_international_number_is_an_e164_phone_not_an_account():
+    intel = extractor.extract("Call our US desk on +1 415 555 2671 today")
+    assert intel.phoneNumbers == ["+14155552671"]
+    assert intel.bankAccounts == []
+
+
+def test_indian_mobile_with_country_code():
+    intel = extractor.extract("WhatsApp +91 98765 43210 for help")
+    assert intel.phoneNumbers == ["+919876543210"]
+    assert intel.bankAccounts == []
+
+
+def test_toll_free_number_is_not_an_account():
+    assert extractor.extract("Customer care 1800-123-4567").bankAccounts == []
+    assert extractor.extract("Customer care 18001234567").bankAccounts == []
+
+
+def test_separated_digit_groups_need_account_context():
+    assert extractor.extract("My Aadhaar is 1234 5678 9012").bankAccounts == []
+    assert extractor.extract("Transfer to account no. 1234 5678 9012").bankAccounts == ["123456789012"]
+    assert extractor.extract("A/C 5010-0234-5678").bankAccounts == ["501002345678"]
+
+
+def test_long_unseparated_run_is_an_account_but_card_numbers_are_not():
+    intel = extractor.extract("Send to 50100234567891 or pay by card 4111 1111 1111 1111 / 4111111111111111")
+    assert intel.bankAccounts == ["50100234567891"]
+
+
+def test_short_runs_and_references_need_account_context():
+    assert extractor.extract("Your OTP is 482913 and order 4029384756 ships today").bankAccounts == []
+    assert extractor.extract("Quote ref 123456789012 when you call").bankAccounts == []
+    assert extractor.extract("Transfer to a/c 402938475").bankAccounts == ["402938475"]
+    # Account context wins even when the number happens to pass Luhn
+    assert extractor.extract("account no 4111111111111111").bankAccounts == ["4111111111111111"]
+
+
+def test_valid_ifsc_is_account_context_but_not_an_account():
+    intel = extractor.extract("Send Rs 4999 to 402938475 IFSC HDFC0001234")
+    assert intel.bankAccounts == ["402938475"]
+    assert extractor.extract("IFSC: sbin0012345, 5010023456 is the number").bankAccounts == ["5010023456"]
+
+
+def test_ifsc_shaped_words_are_not_ifsc():
+    # Mixed case without an IFSC label, or a branch code with no digits
+    assert extractor.extract("Send Hdfc0001234 402938475").bankAccounts == []
+    assert extractor.extract("Send ABCD0EFGHIJ 402938475").bankAccounts == []
+
+
+def test_llm_extracted_account_needs_no_context():
+    llm = extractor.extract("")
+    llm.bankAccounts = ["1234 5678 9012"]
+    assert extractor.merge(extractor.extract(""), llm).bankAccounts == ["123456789012"]
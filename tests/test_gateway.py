@@ -0,0 +1,177 @@
+import time
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from agentic_honeypot.gateway import LLMGateway, CircuitBreaker, CircuitOpenError
+
+REQUEST = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+
+
+def rate_limited(retry_after_ms: str = "1") -> openai.RateLimitError:
+    response = httpx.Response(429, request=REQUEST, headers={"retry-after-ms": retry_after_ms})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def connection_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError(request=REQUEST)
+
+
+def opened_breaker(cooldown: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(threshold=1, cooldown=cooldown)
+    breaker.record_failure()
+    return breaker
+
+
+def test_retries_after_429_then_succeeds():
+    gateway = LLMGateway(max_retries=2)
+    attempts = []
+
+    async def fn():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise rate_limited()
+        return "ok"
+
+    assert asyncio.run(gateway.call("generate_reply", fn)) == "ok"
+    assert len(attempts) == 2
+    assert gateway.counters["rateLimited"] == 1 and gateway.counters["retries"] == 1
+    # Rate limiting is not an upstream failure
+    assert gateway.breaker.state == "closed"
+
+
+def test_429_on_every_attempt_raises_last_error():
+    gateway = LLMGateway(max_retries=1)
+
+    async def fn():
+        raise rate_limited()
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(gateway.call("generate_reply", fn))
+    assert gateway.counters["calls"] == 2
+
+
+def test_backoff_after_transient_error_holds_no_slot():
+    gateway = LLMGateway(max_retries=1, breaker=CircuitBreaker(threshold=5, cooldown=60))
+    gateway._backoff = lambda attempt: 0.2
+    attempts = []
+
+    async def fn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise connection_error()
+        return "ok"
+
+    async def run():
+        task = asyncio.create_task(gateway.call("generate_reply", fn))
+        await asyncio.sleep(0.1)
+        # Backing off between attempts: the failed call has given its slot back
+        assert len(attempts) == 1 and gateway.limiter.in_flight == 0
+        return await task
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_client_errors_are_not_retried():
+    gateway = LLMGateway(max_retries=2)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.call("detect_scam", fn))
+    assert len(calls) == 1 and gateway.breaker.failures == 0
+
+
+def test_breaker_opens_after_threshold_and_short_circuits():
+    gateway = LLMGateway(max_retries=0, breaker=CircuitBreaker(threshold=2, cooldown=60))
+
+    async def fn():
+        raise connection_error()
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(openai.APIConnectionError):
+                await gateway.call("detect_scam", fn)
+        assert gateway.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await gateway.call("detect_scam", fn)
+
+    asyncio.run(run())
+    assert gateway.counters["shortCircuited"] == 1
+
+
+def test_half_open_probe_success_closes_circuit():
+    gateway = LLMGateway(max_retries=0, breaker=opened_breaker())
+    time.sleep(0.06)
+    assert gateway.breaker.state == "half-open"
+
+    async def fn():
+        return "ok"
+
+    assert asyncio.run(gateway.call("detect_scam", fn)) == "ok"
+    assert gateway.breaker.state == "closed" and not gateway.breaker.probing
+
+
+def test_half_open_probe_failure_reopens_circuit():
+    gateway = LLMGateway(max_retries=0, breaker=opened_breaker())
+    time.sleep(0.06)
+
+    async def fn():
+        raise connection_error()
+
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(gateway.call("detect_scam", fn))
+    assert gateway.breaker.state == "open" and not gateway.breaker.probing
+
+
+def test_only_one_probe_at_a_time():
+    gateway = LLMGateway(max_retries=0, breaker=opened_breaker())
+    time.sleep(0.06)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(gateway.call("detect_scam", slow))
+        await asyncio.sleep(0)
+        assert not gateway.breaker.available
+        with pytest.raises(CircuitOpenError):
+            await gateway.call("detect_scam", slow)
+        release.set()
+        assert await probe == "ok"
+
+    asyncio.run(run())
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    gateway = LLMGateway(max_retries=0, breaker=opened_breaker())
+    time.sleep(0.06)
+
+    async def run():
+        async def hang():
+            await asyncio.sleep(60)
+
+        probe = asyncio.create_task(gateway.call("generate_reply", hang))
+        await asyncio.sleep(0.01)
+        assert gateway.breaker.probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # The next caller gets to probe instead of being short-circuited forever
+        assert gateway.breaker.state == "half-open" and gateway.breaker.available
+
+        async def ok():
+            return "ok"
+
+        assert await gateway.call("generate_reply", ok) == "ok"
+
+    asyncio.run(run())
+    assert gateway.breaker.state == "closed"
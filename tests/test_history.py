@@ -0,0 +1,56 @@
+import asyncio
+
+from agentic_honeypot import service
+from agentic_honeypot.history import EMPTY_HISTORY, extend_state, reconcile
+from agentic_honeypot.models import IncomingMessage, Message
+
+
+def conversation(*texts):
+    senders = ("scammer", "user")
+    return [Message(sender=senders[i % 2], text=text, timestamp=f"t{i}") for i, text in enumerate(texts)]
+
+
+def test_same_history_matches():
+    history = conversation("your account is blocked", "which account?")
+    assert reconcile(extend_state(EMPTY_HISTORY, history), history) == ("match", [])
+
+
+def test_longer_history_yields_only_the_tail():
+    history = conversation("your account is blocked", "which account?", "SBI savings", "ok")
+    result, tail = reconcile(extend_state(EMPTY_HISTORY, history[:2]), history)
+    assert result == "extended"
+    assert tail == history[2:]
+
+
+def test_empty_state_extends_to_everything():
+    history = conversation("hello")
+    assert reconcile(EMPTY_HISTORY, history) == ("extended", history)
+
+
+def test_restamped_replies_still_match():
+    history = conversation("your account is blocked", "which account?")
+    echoed = [m.model_copy(update={"timestamp": "later"}) for m in history]
+    assert reconcile(extend_state(EMPTY_HISTORY, history), echoed) == ("match", [])
+
+
+def test_edited_or_shorter_history_diverges():
+    history = conversation("your account is blocked", "which account?", "SBI savings")
+    state = extend_state(EMPTY_HISTORY, history)
+    edited = conversation("your account is blocked", "who are you?", "SBI savings")
+    assert reconcile(state, edited) == ("diverged", edited)
+    assert reconcile(state, history[:2]) == ("diverged", history[:2])
+    assert reconcile("not-a-state", history)[0] == "diverged"
+
+
+def test_delta_request_with_stale_hash_is_told_to_resync():
+    async def main():
+        first = await service.process_message(IncomingMessage(
+            sessionId="history-delta", historyHash=EMPTY_HISTORY,
+            message={"sender": "scammer", "text": "Are we still on for dinner?"}))
+        assert first.status == "success" and first.historyHash
+        stale = await service.process_message(IncomingMessage(
+            sessionId="history-delta", historyHash=EMPTY_HISTORY,
+            message={"sender": "scammer", "text": "Hello?"}))
+        assert (stale.status, stale.historyHash) == ("resync", first.historyHash)
+        await service.drain_background()
+    asyncio.run(main())
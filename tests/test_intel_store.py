@@ -0,0 +1,33 @@
+import asyncio
+
+from agentic_honeypot.intel_store import SQLiteIntelStore
+
+
+def test_top_domains_counts_sessions_not_links(tmp_path):
+    async def run():
+        store = SQLiteIntelStore(str(tmp_path / "intel.db"))
+        store.record("s1", {"phishingLinks": ["http://evil.in/a", "http://evil.in/b", "http://evil.in/c"]})
+        store.record("s2", {"phishingLinks": ["http://evil.in/a", "http://other.in/x"]})
+        await store._write_batch(store._drain(100))
+        try:
+            return await store.top_domains()
+        finally:
+            await store.stop()
+
+    assert asyncio.run(run()) == [{"domain": "evil.in", "sessions": 2}, {"domain": "other.in", "sessions": 1}]
+
+
+def test_known_finds_indicators_from_other_sessions(tmp_path):
+    async def run():
+        store = SQLiteIntelStore(str(tmp_path / "intel.db"))
+        store.record("s1", {"upiIds": ["fraud@ybl"]})
+        await store._write_batch(store._drain(100))
+        try:
+            return (await store.known("s2", {"upiIds": ["fraud@ybl", "new@ybl"]}),
+                    await store.known("s1", {"upiIds": ["fraud@ybl"]}))
+        finally:
+            await store.stop()
+
+    other, same = asyncio.run(run())
+    assert other == {"upiIds": {"fraud@ybl": ["s1"]}}
+    assert same == {}
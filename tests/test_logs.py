@@ -0,0 +1,40 @@
+import asyncio
+import logging
+
+from agentic_honeypot.logs import logger, RequestLogMiddleware
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def request_log(status: int) -> logging.LogRecord:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    handler = Records()
+    logger.addHandler(handler)
+    level = logger.level
+    logger.setLevel(logging.DEBUG)
+    try:
+        scope = {"type": "http", "method": "POST", "path": "/", "headers": []}
+        asyncio.run(RequestLogMiddleware(app)(scope, None, send))
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    [record] = [r for r in handler.records if r.getMessage() == "request"]
+    return record
+
+
+def test_server_errors_are_logged_as_errors():
+    assert request_log(503).levelno == logging.ERROR
+    assert request_log(200).levelno == logging.INFO
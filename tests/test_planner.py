@@ -0,0 +1,54 @@
+import asyncio
+
+from agentic_honeypot import service
+from agentic_honeypot.models import IncomingMessage
+from agentic_honeypot.planner import ExecutionPlanner
+
+SPECULATED_REPLY = "Who is this? Which parcel?"
+
+
+class SlowDetector:
+    """
+    Always needs the LLM, and answers after the speculative reply has finished.
+    """
+
+    def __init__(self, verdict: bool):
+        self.verdict = verdict
+
+    def needs_llm(self, text):
+        return True
+
+    async def detect(self, text):
+        await asyncio.sleep(0.05)
+        return self.verdict
+
+
+def opening_reply_pool(monkeypatch, verdict: bool, text: str):
+    async def generate_reply(*args, **kwargs):
+        return SPECULATED_REPLY
+
+    monkeypatch.setattr(service, "planner", ExecutionPlanner(SlowDetector(verdict), policy="speculate"))
+    monkeypatch.setattr(service.agent_brain, "generate_reply", generate_reply)
+
+    async def main():
+        response = await service.process_message(IncomingMessage(
+            sessionId=f"speculate-{verdict}", message={"sender": "scammer", "text": text}))
+        await service.drain_background()
+        return response
+
+    response = asyncio.run(main())
+    replies = service.response_cache.replies
+    pools = replies.cache.peek(replies.resolve(text, count=False)) or {}
+    return response, [reply for pool in pools.values() for reply in pool]
+
+
+def test_speculative_reply_to_benign_opener_is_not_pooled(monkeypatch):
+    response, pooled = opening_reply_pool(monkeypatch, False, "Your parcel is waiting at the depot, reply to book")
+    assert response.reply == service.BENIGN_REPLY
+    assert pooled == []
+
+
+def test_speculative_reply_to_scam_opener_is_pooled(monkeypatch):
+    response, pooled = opening_reply_pool(monkeypatch, True, "Your parcel is held by customs, pay the fee to release")
+    assert response.reply == SPECULATED_REPLY
+    assert pooled == [SPECULATED_REPLY]
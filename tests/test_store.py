@@ -0,0 +1,103 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from agentic_honeypot.history import Turn, extend_state
+from agentic_honeypot.models import IntelligenceData
+from agentic_honeypot.store import MemorySessionStore, RedisSessionStore, SQLiteSessionStore
+
+STORES = ("memory", "sqlite", "redis")
+
+
+def make_store(kind: str, tmp_path):
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    return RedisSessionStore(client=fakeredis.aioredis.FakeRedis())
+
+
+def run(kind, tmp_path, scenario):
+    async def main():
+        store = make_store(kind, tmp_path)
+        try:
+            return await scenario(store)
+        finally:
+            await store.close()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("kind", STORES)
+def test_create_never_overwrites(kind, tmp_path):
+    async def scenario(store):
+        await store.create("s1", scam_detected=True, persona="ramesh")
+        await store.update("s1", True, 4, IntelligenceData(upiIds=["a@okaxis"]))
+        record = await store.create("s1", scam_detected=False, persona="other")
+        assert (record.scam_detected, record.message_count, record.persona) == (True, 4, "ramesh")
+        assert record.intel.upiIds == ["a@okaxis"]
+    run(kind, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("kind", STORES)
+def test_mark_callback_sent_has_one_winner(kind, tmp_path):
+    async def scenario(store):
+        await store.create("s1", scam_detected=True)
+        results = await asyncio.gather(*(store.mark_callback_sent("s1") for _ in range(10)))
+        assert sorted(results) == [False] * 9 + [True]
+        assert (await store.get("s1")).callback_sent
+    run(kind, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("kind", STORES)
+def test_history_append_and_replace(kind, tmp_path):
+    async def scenario(store):
+        first = [Turn("scammer", "pay now", "t1"), Turn("user", "who is this?", "t2")]
+        await store.create("s1", scam_detected=True)
+        await store.append_history("s1", first[:1], extend_state("", first[:1]))
+        await store.append_history("s1", first[1:], extend_state("", first))
+        assert await store.load_history("s1") == first
+        assert (await store.get("s1")).history_hash == extend_state("", first)
+
+        replaced = [Turn("scammer", "different", "t3")]
+        await store.append_history("s1", replaced, extend_state("", replaced), replace=True)
+        assert await store.load_history("s1") == replaced
+    run(kind, tmp_path, scenario)
+
+
+def test_redis_callback_flag_lives_as_long_as_the_session():
+    async def main():
+        store = RedisSessionStore(client=fakeredis.aioredis.FakeRedis(), ttl=1)
+        await store.create("s1", scam_detected=True)
+        assert await store.mark_callback_sent("s1")
+        # Still active past the TTL counted from the callback: the flag must not expire
+        for _ in range(3):
+            await asyncio.sleep(0.5)
+            await store.update("s1", True, 2)
+        assert (await store.get("s1")).callback_sent
+        assert not await store.mark_callback_sent("s1")
+        await store.close()
+    asyncio.run(main())
+
+
+def test_legacy_redis_callback_key_is_honoured():
+    async def main():
+        store = RedisSessionStore(client=fakeredis.aioredis.FakeRedis())
+        await store.create("s1", scam_detected=True)
+        await store.client.set(store._callback_key("s1"), 1)
+        assert (await store.get("s1")).callback_sent
+        assert not await store.mark_callback_sent("s1")
+        await store.close()
+    asyncio.run(main())
+
+
+def test_sqlite_sessions_are_shared_between_connections(tmp_path):
+    async def main():
+        first = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        second = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        await first.create("s1", scam_detected=True)
+        assert await second.mark_callback_sent("s1")
+        assert not await first.mark_callback_sent("s1")
+        await first.close()
+        await second.close()
+    asyncio.run(main())
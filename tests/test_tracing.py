@@ -0,0 +1,22 @@
+import asyncio
+
+import httpx
+
+from agentic_honeypot.main import app, EXPECTED_API_KEY
+
+
+async def traced_post(body: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/analyze", json=body,
+                                 headers={"x-api-key": EXPECTED_API_KEY, "x-honeypot-trace": "1"})
+
+
+def test_server_timing_names_each_stage_once():
+    history = [{"sender": "scammer", "text": "Hi, is this Ravi?"}, {"sender": "user", "text": "Yes, who is this?"}]
+    response = asyncio.run(traced_post({"sessionId": "trace-1", "conversationHistory": history,
+                                        "message": {"sender": "scammer", "text": "Are we meeting for lunch?"}}))
+    assert response.status_code == 200
+    names = [entry.split(";")[0].strip() for entry in response.headers["server-timing"].split(",")]
+    assert len(names) == len(set(names))
+    assert {"history_load", "history_append"} <= set(names)